@@ -0,0 +1,87 @@
+import hashlib
+import os
+import re
+from typing import List
+
+from cache import LRUCache
+from fingerprint import NEAR_DUPLICATE_BITS, representatives, simhash
+
+_WORD = re.compile(r"\w+")
+
+
+class TokenCounter:
+    """Token counts with a per-document cache.
+
+    Uses tiktoken when it is installed and falls back to a ~4 chars/token
+    estimate otherwise. Counts are cached by content hash, so a document seen
+    by both the packer and the batcher is only encoded once.
+    """
+    def __init__(self, encoding_model: str = "gpt-4", max_entries: int = 50000):
+        try:
+            import tiktoken
+            self.encoder = tiktoken.encoding_for_model(encoding_model)
+        except Exception:
+            self.encoder = None
+        self._counts = LRUCache(max_entries)
+
+    def count(self, text: str) -> int:
+        key = hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+        tokens = self._counts.get(key)
+        if tokens is None:
+            tokens = len(self.encoder.encode(text)) if self.encoder else len(text) // 4 + 1
+            self._counts.set(key, tokens)
+        return tokens
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        if self.encoder:
+            return self.encoder.decode(self.encoder.encode(text)[:max_tokens])
+        return text[:max_tokens * 4]
+
+
+def relevance(text: str, topic: str) -> float:
+    """Share of topic terms present in the text, weighted by how often they occur"""
+    terms = set(_WORD.findall(topic.lower()))
+    if not terms:
+        return 0.0
+    words = _WORD.findall(text.lower())
+    if not words:
+        return 0.0
+    hits = sum(1 for w in words if w in terms)
+    coverage = len(terms & set(words)) / len(terms)
+    return coverage + hits / len(words)
+
+
+def pack_context(docs: List[str], topic: str, budget: int = None, counter: TokenCounter = None,
+                 max_distance: int = NEAR_DUPLICATE_BITS) -> List[str]:
+    """Choose the documents that go into a prompt.
+
+    Near-duplicates are clustered by SimHash (within max_distance bits) and
+    only the first of each cluster is kept; those are ranked by relevance to
+    the topic (ties keep search order), and the budget is filled greedily.
+    A top document that alone exceeds the budget is truncated rather than
+    dropped.
+    """
+    budget = budget or CONTEXT_BUDGET
+    counter = counter or token_counter
+
+    docs = [doc for doc in docs if doc and doc.strip()]
+    unique = [docs[i] for i in representatives(((i, simhash(doc)) for i, doc in enumerate(docs)), max_distance)]
+
+    ranked = sorted(enumerate(unique), key=lambda item: (-relevance(item[1], topic), item[0]))
+
+    packed, used = [], 0
+    for _, doc in ranked:
+        tokens = counter.count(doc)
+        if used + tokens <= budget:
+            packed.append(doc)
+            used += tokens
+        elif not packed:
+            packed.append(counter.truncate(doc, budget))
+            used = budget
+    return packed
+
+
+CONTEXT_BUDGET = int(os.getenv("WRITER_CONTEXT_TOKENS", 8000))
+
+# Shared so counts cached by one caller are reused by the others
+token_counter = TokenCounter()
@@ -1,12 +1,48 @@
+import asyncio
 import os
 from langgraph.graph import StateGraph, END
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.messages import SystemMessage, HumanMessage
 from .state import AgentState
-from .tools import search_web, scrape_article
+from .tools import SearchFailed, asearch_web, is_search_error, local_corpus
+from .context import CONTEXT_BUDGET, pack_context, token_counter
+from .memory import INCREMENTAL, topic_memory
+from costs import EXHAUSTED, TIGHT, cost_tracker
+from llm import CHEAP_MODEL, DEFAULT_MODEL, cached_ainvoke, response_cache
+from summarizer import ERROR_PREFIXES, LLMSummarizer
+from topic_index import normalize_topic
+from fingerprint import representatives, simhash
+from tracing import tracer
 import json
 
+# Enough recent local matches and the researcher skips SerpApi altogether
+LOCAL_MIN_HITS = int(os.getenv("LOCAL_MIN_HITS", 5))
+
+NO_NEWS = "No new developments since the last briefing."
+
+# "gemini" (default) writes with one cached Gemini call; "openai" map-reduces over batches
+WRITER_BACKEND = os.getenv("WRITER_BACKEND", "gemini").lower()
+# The openai backend's stand-in for CHEAP_MODEL once the daily budget runs tight
+OPENAI_CHEAP_MODEL = os.getenv("OPENAI_CHEAP_MODEL", "gpt-4o-mini")
+
+_summarizer = None
+
+def get_summarizer():
+    global _summarizer
+    if _summarizer is None:
+        _summarizer = LLMSummarizer(api_key=os.getenv("OPENAI_API_KEY"))
+    return _summarizer
+
+def parse_result(result: str) -> dict:
+    """Split a "Title: ...\nLink: ...\nSnippet: ..." search result into fields"""
+    fields = {}
+    for line in result.split('\n'):
+        name, sep, value = line.partition(': ')
+        if sep and name in ('Title', 'Link', 'Snippet') and name not in fields:
+            fields[name] = value.strip()
+    return fields
+
 # Node Definitions
+@tracer.traced("planner")
 def planner_node(state: AgentState):
     """Decides what to research based on the topic."""
     topic = state['topic']
@@ -14,51 +50,134 @@ def planner_node(state: AgentState):
     print(f"--- Planning research for: {topic} ---")
     return {"messages": [f"Researching {topic}"]}
 
-def researcher_node(state: AgentState):
+async def _search(query: str, topic: str):
+    # asearch_web holds the serpapi rate limit per attempt, not across retries
+    with tracer.span("serpapi") as span:
+        results = await asearch_web.ainvoke(query)
+        span.set(results=len(results))
+    if not any(is_search_error(r) for r in results):
+        cost_tracker.record("serpapi", topic=normalize_topic(topic))
+    return results
+
+@tracer.traced("researcher")
+async def researcher_node(state: AgentState):
     """Executes search and scrape."""
     topic = state['topic']
     print(f"--- Researching: {topic} ---")
     
-    # 1. Search News
-    news_results = search_web.invoke(f"{topic} news")
+    if cost_tracker.budget_state() == EXHAUSTED:
+        # Out of budget: the writer falls back to the last cached briefing
+        print(f"--- Daily budget exhausted, skipping search for: {topic} ---")
+        return {"research_results": [], "sources": []}
     
-    # 2. Search Blogs/Opinions
-    blog_results = search_web.invoke(f"{topic} blog analysis opinion")
+    # 0. Ingested feeds first; they cost nothing to search
+    local_results = await local_corpus.search(topic)
+    if len(local_results) >= LOCAL_MIN_HITS:
+        print(f"--- {len(local_results)} local articles found, skipping web search for: {topic} ---")
+        news_results, blog_results = [], []
+    else:
+        # 1. Search News and 2. Blogs/Opinions, concurrently
+        news_results, blog_results = await asyncio.gather(
+            _search(f"{topic} news", topic),
+            _search(f"{topic} blog analysis opinion", topic),
+        )
     
-    # Combine results
-    all_results = news_results + blog_results
+    # Combine results; failed searches are not news
+    all_results = local_results + news_results + blog_results
+    failures = [r for r in all_results if is_search_error(r)]
+    all_results = [r for r in all_results if not is_search_error(r)]
+    if failures and not all_results:
+        raise SearchFailed(failures[0])
     
-    # Extract links from the formatted strings
-    links = []
+    # One result per link (first wins), then one per near-duplicate cluster,
+    # so syndicated copies of a story are not paid for twice in the context
+    by_key, links = {}, []
     for r in all_results:
-        # Each result is "Title: ...\nLink: ...\nSnippet: ..."
-        try:
-            link_line = [l for l in r.split('\n') if l.startswith('Link: ')]
-            if link_line:
-                url = link_line[0].replace('Link: ', '').strip()
-                if url not in links: # Deduplicate
-                    links.append(url)
-        except:
-            continue
+        link = parse_result(r).get('Link')
+        if link and link not in by_key:
+            links.append(link)
+        by_key.setdefault(link or r, (link, r))
+    unique = list(by_key.values())
+    # Copies of a story whose pages were already fetched compare by full text.
+    # A search snippet is too short for that: its fingerprint only catches
+    # near-verbatim copies, since a threshold loose enough for reworded
+    # snippets would also merge distinct stories.
+    stored = await local_corpus.fingerprints(links)
+    results = [unique[i][1] for i in representatives(
+        (i, stored.get(link) or simhash(r)) for i, (link, r) in enumerate(unique))]
+
+    # Incremental mode: drop what an earlier briefing already covered, unless
+    # a subscriber never got that briefing (then everyone gets a full one)
+    previous = None
+    if INCREMENTAL:
+        previous = await topic_memory.previous_summary(topic)
+        if previous:
+            fresh = await topic_memory.new_results(topic, results)
+            print(f"--- {len(fresh)} of {len(results)} results are new for: {topic} ---")
+            results = fresh
 
     return {
-        "research_results": all_results,
-        "sources": links
+        "research_results": results,
+        "sources": links,
+        "previous_summary": previous or ""
     }
 
-def writer_node(state: AgentState):
+@tracer.traced("writer")
+async def writer_node(state: AgentState):
     """Synthesizes the findings."""
     print(f"--- Writing summary for: {state['topic']} ---")
     
-    model = ChatGoogleGenerativeAI(model="gemini-3-pro-preview", api_key=os.getenv("GOOGLE_API_KEY"))
+    # Degrade as the daily budget runs out: cheaper model and half the
+    # context when tight, yesterday's briefing once exhausted
+    budget_state = cost_tracker.budget_state()
+    if budget_state == EXHAUSTED:
+        cached = response_cache.latest(state['topic'], kind="briefing")
+        return {"summary": cached or "Today's briefing was skipped: the daily research budget is used up."}
+    model, context_budget = DEFAULT_MODEL, CONTEXT_BUDGET
+    if budget_state == TIGHT:
+        model, context_budget = CHEAP_MODEL, CONTEXT_BUDGET // 2
+    openai_model = OPENAI_CHEAP_MODEL if budget_state == TIGHT else None  # None: the summarizer's own
+    
+    # Nothing new since the last briefing: no LLM call at all
+    previous = state.get('previous_summary')
+    if previous and not state['research_results']:
+        return {"summary": NO_NEWS}
     
-    context = "\n\n".join(state['research_results'])
+    # Deduplicated, relevance-ranked snippets within a fixed token budget
+    packed = pack_context(state['research_results'], state['topic'], budget=context_budget)
+    context = "\n\n".join(packed)
     sys_msg = SystemMessage(content="You are an expert news analyst. Summarize the provided research context into a concise daily briefing with html formatting.")
     user_msg = HumanMessage(content=f"Topic: {state['topic']}\n\nContext:\n{context}")
+    if previous:
+        # Delta briefing: the earlier one is there to say what not to repeat
+        sys_msg = SystemMessage(content="You are an expert news analyst. Summarize only what is new in the provided research context, compared with the previous briefing, into a concise daily update with html formatting. Do not repeat stories the previous briefing already covered.")
+        previous = token_counter.truncate(previous, context_budget // 4)
+        user_msg = HumanMessage(content=f"Topic: {state['topic']}\n\nPrevious briefing:\n{previous}\n\nNew context:\n{context}")
     
-    response = model.invoke([sys_msg, user_msg])
+    # Both backends write from the same packed context, so they cover the same results
+    if WRITER_BACKEND == "openai":
+        articles = []
+        for r in packed:
+            fields = parse_result(r)
+            articles.append({
+                'title': fields.get('Title', ''),
+                'link': fields.get('Link', ''),
+                'source_name': fields.get('Link', 'Web'),
+                'full_text': fields.get('Snippet') or r,
+            })
+        summary = await get_summarizer().summarize_topic(articles, state['topic'], previous=previous or None,
+                                                         model=openai_model)
+        if summary.startswith(ERROR_PREFIXES):
+            return {"summary": summary}  # not remembered, so tomorrow retries these results
+    else:
+        # Identical prompts for the same topic (e.g. a re-run the same day) are served from cache
+        summary = await cached_ainvoke([sys_msg, user_msg], topic=state['topic'], model=model,
+                                       kind="briefing")
     
-    return {"summary": response.text}
+    if INCREMENTAL:
+        # Results cut by the context budget stay new for the next run
+        await topic_memory.remember(state['topic'], packed, summary)
+    return {"summary": summary}
 
 
 # Graph Construction
@@ -0,0 +1,115 @@
+import asyncio
+import json
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from .tools import is_search_error
+from fingerprint import NEAR_DUPLICATE_BITS, SimHashIndex, from_sqlite, simhash, to_sqlite
+from topic_index import normalize_topic
+
+# Incremental mode: brief only on results not covered by an earlier briefing
+INCREMENTAL = os.getenv("INCREMENTAL_RESEARCH", "1").lower() not in ("0", "false", "no")
+# How long a summarized story keeps counting as already covered
+MEMORY_DAYS = float(os.getenv("TOPIC_MEMORY_DAYS", 14))
+# How long the subscribers' last-send times are reused before being re-read
+RECIPIENTS_TTL_SECONDS = 600
+# Oldest send of a topic when one of its subscribers has never received a digest
+_NEVER = ""
+
+
+def _link(result: str) -> Optional[str]:
+    for line in result.split('\n'):
+        if line.startswith('Link: '):
+            return line[len('Link: '):].strip()
+    return None
+
+
+def _oldest_sends(users) -> Dict[str, str]:
+    oldest: Dict[str, str] = {}
+    for _, topics_json, last_sent_at in users:
+        try:
+            topics = json.loads(topics_json)
+        except (TypeError, ValueError):
+            continue
+        sent = str(last_sent_at) if last_sent_at else _NEVER
+        for topic in topics:
+            key = normalize_topic(topic)
+            if key and (key not in oldest or sent < oldest[key]):
+                oldest[key] = sent
+    return oldest
+
+
+def _near(index: SimHashIndex, fingerprint: Optional[int]) -> bool:
+    return fingerprint is not None and bool(index.near(fingerprint))
+
+
+class TopicMemory:
+    """What has already been summarized for each topic.
+
+    Results are "seen" when their link, or a near-duplicate of their text
+    (SimHash within max_distance bits), went into an earlier briefing.
+    Entry points attach their Database; with none attached every result is
+    new and nothing is remembered.
+
+    A topic's briefing is shared by all its subscribers, so a delta is only
+    written when every one of them was sent a digest after the previous
+    briefing. A new subscriber, or one whose last send failed, makes the
+    topic get a full briefing again.
+    """
+    def __init__(self, db=None, max_distance: int = NEAR_DUPLICATE_BITS, memory_days: float = MEMORY_DAYS):
+        self.db = db
+        self.max_distance = max_distance
+        self.memory_days = memory_days
+        self._oldest_sends: Optional[Dict[str, str]] = None
+        self._loaded_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def previous_summary(self, topic: str) -> Optional[str]:
+        """Last briefing for a topic, or None when a subscriber never received it"""
+        if self.db is None:
+            return None
+        topic = normalize_topic(topic)
+        state = await self.db.run(self.db.get_topic_state, topic)
+        if not state:
+            return None
+        summary, updated_at = state
+        oldest = (await self.oldest_sends()).get(topic)
+        if oldest is not None and (oldest == _NEVER or str(oldest) < str(updated_at)):
+            return None
+        return summary
+
+    async def oldest_sends(self) -> Dict[str, str]:
+        """{normalized topic: earliest last_sent_at among its verified subscribers}"""
+        async with self._lock:
+            if self._oldest_sends is None or time.monotonic() - self._loaded_at > RECIPIENTS_TTL_SECONDS:
+                users = await self.db.run(self.db.get_verified_users)
+                self._oldest_sends = _oldest_sends(users)
+                self._loaded_at = time.monotonic()
+            return self._oldest_sends
+
+    async def new_results(self, topic: str, results: List[str]) -> List[str]:
+        results = [r for r in results if not is_search_error(r)]
+        if self.db is None or not results:
+            return results
+        since = datetime.now() - timedelta(days=self.memory_days)
+        seen = await self.db.run(self.db.get_topic_seen, normalize_topic(topic), since)
+        links = {link for link, _ in seen}
+        index = SimHashIndex(self.max_distance)
+        for link, fingerprint in seen:
+            if fingerprint is not None:
+                index.add(link, from_sqlite(fingerprint))
+        return [r for r in results if _link(r) not in links and not _near(index, simhash(r))]
+
+    async def remember(self, topic: str, results: List[str], summary: str):
+        results = [r for r in results if not is_search_error(r)]
+        if self.db is None or not results:
+            return  # a briefing written from failed searches must not replace the last real one
+        seen = [(_link(r) or r, to_sqlite(simhash(r))) for r in results]
+        forget_before = datetime.now() - timedelta(days=self.memory_days)
+        await self.db.run(self.db.record_topic_summary, normalize_topic(topic), summary, seen,
+                          forget_before=forget_before)
+
+
+topic_memory = TopicMemory()
@@ -7,3 +7,4 @@ class AgentState(TypedDict):
     research_results: Annotated[List[str], operator.add]
     sources: Annotated[List[str], operator.add]
     summary: str
+    previous_summary: str  # last briefing for the topic, set in incremental mode
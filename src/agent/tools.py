@@ -1,7 +1,10 @@
 from langchain_core.tools import tool
-from trafilatura import extract
-import requests
-from typing import List
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List
+from concurrency import limits
+from fetcher import shared_fetcher
+from resilience import retry_after
+from fingerprint import from_sqlite, representatives
 
 import os
 try:
@@ -9,6 +12,55 @@ try:
 except ImportError:
     GoogleSearch = None
 
+SERPAPI_URL = os.getenv("SERPAPI_URL", "https://serpapi.com/search.json")
+# Only articles this recent count as local hits for a daily briefing
+LOCAL_SEARCH_HOURS = float(os.getenv("LOCAL_SEARCH_HOURS", 24))
+# Extra attempts after a 429 or 5xx; the serpapi rate limit spaces them out
+SERPAPI_RETRIES = int(os.getenv("SERPAPI_RETRIES", 2))
+
+# What the search tools return instead of results when they fail
+SEARCH_ERROR_PREFIXES = ("Error:", "Search failed:")
+
+class SearchFailed(Exception):
+    """Every search for a topic failed; raised so the job is retried instead of briefing on errors"""
+
+def is_search_error(result: str) -> bool:
+    return result.startswith(SEARCH_ERROR_PREFIXES)
+
+def _format_results(results: list) -> List[str]:
+    return [f"Title: {r.get('title')}\nLink: {r.get('link')}\nSnippet: {r.get('snippet')}" for r in results[:10]]
+
+class LocalCorpus:
+    """Full-text search over articles already ingested into the database.
+
+    Entry points attach their Database; with none attached every search
+    comes back empty and the researcher goes to the web as before.
+    """
+    def __init__(self, db=None):
+        self.db = db
+
+    async def search(self, topic: str, limit: int = 10) -> List[str]:
+        if self.db is None:
+            return []
+        # published (feedparser) and processed_at (CURRENT_TIMESTAMP) are naive UTC
+        since = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(hours=LOCAL_SEARCH_HOURS)
+        rows = await self.db.run(self.db.search_articles, topic, since=since, limit=limit)
+        # Syndicated copies share a fingerprint cluster; keep the best-ranked one
+        kept = representatives((i, from_sqlite(row[4])) for i, row in enumerate(rows))
+        return _format_results([
+            {'title': title or link, 'link': link, 'snippet': summary or excerpt}
+            for title, link, summary, excerpt, _ in (rows[i] for i in kept)
+        ])
+
+    async def fingerprints(self, links: List[str]) -> Dict[str, int]:
+        """Full-text SimHashes of the links already fetched and stored"""
+        if self.db is None or not links:
+            return {}
+        stored = await self.db.run(self.db.get_fingerprints, links)
+        return {link: from_sqlite(value) for link, value in stored.items()}
+
+local_corpus = LocalCorpus()
+
 @tool
 def search_web(query: str) -> List[str]:
     """Search the web for a query using SerpApi."""
@@ -29,18 +81,44 @@ def search_web(query: str) -> List[str]:
         search = GoogleSearch(params)
         results = search.get_dict().get("organic_results", [])
         
-        return [f"Title: {r.get('title')}\nLink: {r.get('link')}\nSnippet: {r.get('snippet')}" for r in results[:10]]
+        return _format_results(results)
     except Exception as e:
         return [f"Search failed: {str(e)}"]
 
 @tool
-def scrape_article(url: str) -> str:
-    """Scrape the content of a specific URL."""
+async def asearch_web(query: str) -> List[str]:
+    """Search the web for a query using SerpApi, without blocking the event loop."""
+    api_key = os.getenv("SERPAPI_API_KEY")
+    if not api_key:
+        return ["Error: SERPAPI_API_KEY not found in .env"]
+
     try:
-        response = requests.get(url, timeout=10, headers={'User-Agent': 'NewsAgent/1.0'})
-        text = extract(response.text)
-        if text:
-            return text[:10000] # Limit content length
-        return "Failed to extract content."
+        params = {
+            "q": query,
+            "api_key": api_key,
+            "engine": "google",
+            "tbs": "qdr:d" # Past 24 hours
+        }
+        for attempt in range(SERPAPI_RETRIES + 1):
+            async with limits.provider("serpapi") as call:
+                async with shared_fetcher.session.get(SERPAPI_URL, params=params) as response:
+                    if response.status == 429:
+                        call.throttled(retry_after(response.headers))
+                    elif response.status >= 500:
+                        call.failed(f"HTTP {response.status}")
+                    else:
+                        response.raise_for_status()
+                        data = await response.json()
+                        return _format_results(data.get("organic_results", []))
+        return [f"Search failed: HTTP {response.status} after {SERPAPI_RETRIES + 1} attempts"]
     except Exception as e:
-        return f"Error scraping {url}: {str(e)}"
+        return [f"Search failed: {str(e)}"]
+
+@tool
+async def scrape_article(url: str) -> str:
+    """Scrape the content of a specific URL."""
+    # Shared pool and article cache; fetch_full_content returns "" on failure
+    text = await shared_fetcher.fetch_full_content(url, max_chars=10000) # Limit content length
+    if text:
+        return text
+    return "Failed to extract content."
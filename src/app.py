@@ -61,22 +61,52 @@ def get():
         )
     )
 
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.messages import HumanMessage
+from llm import cached_ainvoke, response_cache
+from concurrency import BackgroundQueue
+from costs import cost_tracker
+from topic_index import normalize_topic
+from topic_validation import TopicAllowlist, classify_topic
+from tracing import tracer
+from starlette.responses import PlainTextResponse
 
-# Initialize Validator Model
-# Using flash model for speed if available, or just standard pro
-validator_model = ChatGoogleGenerativeAI(model="gemini-3-pro-preview", api_key=os.getenv("GOOGLE_API_KEY"))
+# Validation verdicts are stable, so cache them for much longer than briefings
+response_cache.db = db
+cost_tracker.db = db
+VALIDATION_TTL_HOURS = float(os.getenv("VALIDATION_CACHE_TTL_HOURS", 24 * 30))
+
+# Known-good topics are accepted without asking the LLM
+allowlist = TopicAllowlist.load(db)
+# OTP emails go out after the response instead of before it
+outbox = BackgroundQueue(workers=int(os.getenv("OTP_SEND_WORKERS", 2)))
 
 async def validate_topic(topic: str) -> bool:
+    topic = normalize_topic(topic)
+    if topic in allowlist:
+        return True
+    verdict = classify_topic(topic)
+    if verdict is not None:
+        return verdict
     try:
         msg = HumanMessage(content=f"Is the text '{topic}' a valid, meaningful topic for a news research agent? It must be a real word or concept in English, not random junk characters, gibberish, or spam. Respond with only 'VALID' or 'INVALID'.")
-        response = await validator_model.ainvoke([msg])
-        return response.text.strip().upper()
+        response = await cached_ainvoke([msg], topic=topic, ttl_hours=VALIDATION_TTL_HOURS, kind="validation")
     except Exception as e:
         print(f"Validation error for {topic}: {e}")
         # Fallback to len check if LLM fails
         return len(topic) > 2
+    is_valid = response.strip().upper() == "VALID"
+    if is_valid:
+        allowlist.learn(topic)
+    return is_valid
+
+@rt('/metrics')
+def get():
+    # Prometheus scrape target for this process's spans and counters
+    return PlainTextResponse(tracer.prometheus(), media_type="text/plain; version=0.0.4")
+
+async def send_otp(email: str, otp: str) -> bool:
+    html_content = mailer.render_otp_template(otp)
+    return await mailer.send_email("Your Verification Code", html_content, to_email=email)
 
 @rt('/subscribe')
 async def post(topic1: str, topic2: str, topic3: str, email: str):
@@ -91,7 +121,7 @@ async def post(topic1: str, topic2: str, topic3: str, email: str):
     # Run keys in parallel for speed
     results = await asyncio.gather(*[validate_topic(t) for t in topics])
     
-    invalid_topics = [t for t, is_valid in zip(topics, results) if is_valid != "VALID"]
+    invalid_topics = [t for t, is_valid in zip(topics, results) if not is_valid]
     print(invalid_topics)
     if invalid_topics:
         return Div(
@@ -115,19 +145,16 @@ async def post(topic1: str, topic2: str, topic3: str, email: str):
 
     otp = generate_otp()
     
-    # Save to UserDB (pending verification)
-    db.upsert_user(email, json.dumps(topics), otp)
+    # Save to UserDB (pending verification), off the event loop
+    await db.run(db.upsert_user, email, json.dumps(topics), otp)
     
-    # Send OTP Email
-    try:
-        html_content = mailer.render_otp_template(otp)
-        await mailer.send_email("Your Verification Code", html_content, to_email=email)
-    except Exception as e:
-        return P(f"Error sending email: {e}", style="color: red;")
+    # Send OTP Email in the background; retried there if Mailjet fails
+    if not outbox.submit(send_otp, email, otp):
+        return P("We are receiving a lot of signups right now. Please try again in a minute.", style="color: red;")
 
     return Div(
         H2("Verify your Email"),
-        P(f"We sent a verification code to {email}."),
+        P(f"We are sending a verification code to {email}."),
         Form(
             Input(type="hidden", name="email", value=email),
             Label("Enter OTP", Input(type="text", name="otp", required=True)),
@@ -139,9 +166,9 @@ async def post(topic1: str, topic2: str, topic3: str, email: str):
     )
 
 @rt('/verify')
-def post(email: str, otp: str):
+async def post(email: str, otp: str):
     # Verify OTP
-    record = db.get_user_otp(email)
+    record = await db.run(db.get_user_otp, email)
     if not record:
         return P("User not found.", style="color: red;")
     
@@ -160,7 +187,7 @@ def post(email: str, otp: str):
         )
     
     # Mark Verified
-    db.verify_user(email)
+    await db.run(db.verify_user, email)
     
     return Div(
         H2("Subscription Successful!"),
@@ -0,0 +1 @@
+"""Offline benchmark harness: local fakes for SerpApi, Gemini, Mailjet and article sites (see bench.run)."""
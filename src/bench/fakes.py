@@ -0,0 +1,207 @@
+# src/bench/fakes.py
+import asyncio
+import hashlib
+import html
+import random
+import re
+from email.utils import formatdate
+from typing import Dict, List
+
+from aiohttp import web
+
+# Enough vocabulary for snippets, articles and topic names to look like prose
+WORDS = (
+    "market energy battery quantum chip supply policy central bank inflation rate growth climate "
+    "carbon solar wind grid storage model training inference cluster datacenter startup funding "
+    "round merger regulator court ruling election coalition budget deficit export tariff factory "
+    "robot vehicle charging launch orbit satellite engine race team driver season transfer league "
+    "vaccine trial hospital research study survey analyst forecast quarter earnings revenue profit "
+    "security breach patch network cloud platform developer release version open source license "
+    "housing mortgage rent wage labor union strike port shipping freight crop harvest drought flood"
+).split()
+TOPIC_NOUNS = ("batteries", "chips", "rates", "robotics", "satellites", "elections", "tariffs",
+               "datacenters", "vaccines", "shipping", "startups", "grids", "mortgages", "racing")
+
+
+def _rng(*parts) -> random.Random:
+    return random.Random(hashlib.sha256("|".join(map(str, parts)).encode("utf-8")).digest())
+
+
+def _sentence(rng: random.Random, words: int) -> str:
+    text = " ".join(rng.choice(WORDS) for _ in range(words))
+    return text[0].upper() + text[1:] + "."
+
+
+def _slug(text: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", text.lower()).strip("-")
+
+
+class Scenario:
+    """Knobs for one benchmark run.
+
+    `overlap` is the share of topic picks that land on a topic someone else
+    already chose: 0 gives every user their own topics, values near 1 give
+    everyone the same few. Latencies are what each fake waits per request.
+    """
+    def __init__(self, users: int = 100, topics_per_user: int = 3, overlap: float = 0.5,
+                 page_kb: int = 50, results_per_search: int = 10, feed_entries: int = 10,
+                 serp_latency: float = 0.2, llm_latency: float = 1.0, mail_latency: float = 0.1,
+                 page_latency: float = 0.05, seed: int = 0):
+        self.users = users
+        self.topics_per_user = topics_per_user
+        self.overlap = min(max(overlap, 0.0), 1.0)
+        self.page_kb = page_kb
+        self.results_per_search = results_per_search
+        self.feed_entries = feed_entries
+        self.serp_latency = serp_latency
+        self.llm_latency = llm_latency
+        self.mail_latency = mail_latency
+        self.page_latency = page_latency
+        self.seed = seed
+
+    def topics(self) -> List[str]:
+        picks = self.users * self.topics_per_user
+        count = max(self.topics_per_user, round(picks * (1 - self.overlap)))
+        rng = _rng("topics", self.seed)
+        return [f"{rng.choice(WORDS)} {TOPIC_NOUNS[i % len(TOPIC_NOUNS)]} {i}" for i in range(count)]
+
+    def user_topics(self) -> Dict[str, List[str]]:
+        pool = self.topics()
+        rng = _rng("users", self.seed)
+        return {f"user{i:06d}@bench.invalid": rng.sample(pool, min(self.topics_per_user, len(pool)))
+                for i in range(self.users)}
+
+    def as_dict(self) -> dict:
+        return dict(vars(self))
+
+
+def article_html(slug: str, page_kb: int) -> str:
+    """A news page of roughly page_kb kilobytes: boilerplate around one article"""
+    rng = _rng("article", slug)
+    title = _sentence(rng, 8)[:-1]
+    nav = "".join(f'<li><a href="/section/{w}">{w.title()}</a></li>' for w in rng.sample(WORDS, 12))
+    head = (f"<!DOCTYPE html><html><head><meta charset=\"utf-8\"><title>{html.escape(title)}</title>"
+            f"<style>body{{font-family:sans-serif}}</style><script>var tracking = {{}};</script></head>"
+            f"<body><nav><ul>{nav}</ul></nav><main><article><h1>{html.escape(title)}</h1>")
+    tail = "</article></main><aside>Related stories</aside><footer>Copyright Bench News</footer></body></html>"
+    body, size = [], len(head) + len(tail)
+    while size < page_kb * 1024:
+        paragraph = "<p>" + " ".join(_sentence(rng, rng.randint(12, 24)) for _ in range(4)) + "</p>"
+        body.append(paragraph)
+        size += len(paragraph)
+    return head + "".join(body) + tail
+
+
+class FakeServices:
+    """Local HTTP stand-ins for SerpApi, Mailjet and the article sites.
+
+    Routes: GET /search.json (SerpApi), POST /v3.1/send (Mailjet),
+    GET /articles/<slug> (pages of scenario.page_kb) and GET /feeds/<n>.xml
+    (one RSS feed per scenario topic). Request counts are kept in `stats`.
+    """
+    def __init__(self, scenario: Scenario, host: str = "127.0.0.1", port: int = 0):
+        self.scenario = scenario
+        self.host = host
+        self.port = port
+        self.base_url = None
+        self.stats = {"searches": 0, "pages": 0, "feeds": 0, "mail_requests": 0, "mail_messages": 0}
+        self._topics = scenario.topics()
+        self._runner = None
+
+    async def start(self) -> str:
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_get("/search.json", self.search)
+        app.router.add_post("/v3.1/send", self.send)
+        app.router.add_get("/articles/{slug}", self.article)
+        app.router.add_get("/feeds/{index}.xml", self.feed)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        port = self._runner.addresses[0][1]
+        self.base_url = f"http://{self.host}:{port}"
+        return self.base_url
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def search(self, request: web.Request) -> web.Response:
+        self.stats["searches"] += 1
+        await asyncio.sleep(self.scenario.serp_latency)
+        query = request.query.get("q", "")
+        rng = _rng("search", query)
+        results = []
+        for i in range(self.scenario.results_per_search):
+            slug = f"{_slug(query)}-{i}"
+            results.append({
+                "title": _sentence(rng, 7)[:-1],
+                "link": f"{self.base_url}/articles/{slug}",
+                "snippet": f"{query}: " + _sentence(rng, 25),
+            })
+        return web.json_response({"organic_results": results})
+
+    async def send(self, request: web.Request) -> web.Response:
+        self.stats["mail_requests"] += 1
+        await asyncio.sleep(self.scenario.mail_latency)
+        messages = (await request.json()).get("Messages", [])
+        self.stats["mail_messages"] += len(messages)
+        return web.json_response({"Messages": [
+            {"Status": "success", "CustomID": m.get("CustomID", ""), "To": m.get("To", [])}
+            for m in messages
+        ]})
+
+    async def article(self, request: web.Request) -> web.Response:
+        self.stats["pages"] += 1
+        await asyncio.sleep(self.scenario.page_latency)
+        page = article_html(request.match_info["slug"], self.scenario.page_kb)
+        return web.Response(text=page, content_type="text/html")
+
+    async def feed(self, request: web.Request) -> web.Response:
+        self.stats["feeds"] += 1
+        index = int(request.match_info["index"])
+        if index >= len(self._topics):
+            raise web.HTTPNotFound()
+        topic = self._topics[index]
+        rng = _rng("feed", topic)
+        now = formatdate(usegmt=True)
+        items = "".join(
+            f"<item><title>{html.escape(topic)}: {html.escape(_sentence(rng, 6)[:-1])}</title>"
+            f"<link>{self.base_url}/articles/{_slug(topic)}-feed-{j}</link>"
+            f"<guid>{_slug(topic)}-feed-{j}</guid>"
+            f"<description>{html.escape(_sentence(rng, 30))}</description>"
+            f"<pubDate>{now}</pubDate></item>"
+            for j in range(self.scenario.feed_entries)
+        )
+        xml = (f'<?xml version="1.0"?><rss version="2.0"><channel><title>Bench {html.escape(topic)}</title>'
+               f"<link>{self.base_url}</link><description>bench feed</description>{items}</channel></rss>")
+        return web.Response(text=xml, content_type="application/rss+xml")
+
+    def feed_urls(self) -> Dict[str, str]:
+        """{feed url: topic} for registering the fake feeds as sources"""
+        return {f"{self.base_url}/feeds/{i}.xml": topic for i, topic in enumerate(self._topics)}
+
+
+class FakeMessage:
+    def __init__(self, text: str, input_tokens: int, output_tokens: int):
+        self.text = text
+        self.content = text
+        self.usage_metadata = {"input_tokens": input_tokens, "output_tokens": output_tokens,
+                               "total_tokens": input_tokens + output_tokens}
+
+
+class FakeChatModel:
+    """Stand-in for the Gemini chat model: waits `latency`, answers with a briefing built from the prompt"""
+    def __init__(self, latency: float = 1.0):
+        self.latency = latency
+        self.calls = 0
+
+    async def ainvoke(self, messages) -> FakeMessage:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        prompt = "\n".join(str(getattr(m, "content", m)) for m in messages)
+        titles = [line[len("Title: "):] for line in prompt.splitlines() if line.startswith("Title: ")]
+        items = "".join(f"<li><strong>{html.escape(t)}</strong></li>" for t in titles[:8])
+        text = f"<h3>Key developments</h3><ul>{items}</ul><p>{len(titles)} sources reviewed.</p>"
+        return FakeMessage(text, input_tokens=len(prompt) // 4 + 1, output_tokens=len(text) // 4 + 1)
@@ -0,0 +1,172 @@
+# src/bench/run.py
+"""Offline benchmark of the nightly run against local fakes.
+
+    cd src && python -m bench.run --users 500 --overlap 0.8 --page-kb 80 --ingest
+
+Every external service is replaced: SerpApi, Mailjet and the article sites
+by a local HTTP server (bench.fakes.FakeServices), Gemini by an in-process
+fake chat model. The run happens in a scratch directory with its own
+database, so nothing real is read, written or sent.
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+SRC = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SRC not in sys.path:
+    sys.path.insert(0, SRC)  # the project modules import each other top-level
+
+from bench.fakes import FakeChatModel, FakeServices, Scenario
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def stage_stats(trace_path: str) -> Dict[str, dict]:
+    """Per-span count, total, p50, p95 and max (ms) from a TRACE_FILE"""
+    durations: Dict[str, List[float]] = {}
+    if os.path.exists(trace_path):
+        with open(trace_path) as f:
+            for line in f:
+                span = json.loads(line)
+                durations.setdefault(span["name"], []).append(span["ms"])
+    stats = {}
+    for name, values in durations.items():
+        values.sort()
+        stats[name] = {
+            "count": len(values), "total_ms": round(sum(values), 1),
+            "p50_ms": round(_percentile(values, 0.5), 1), "p95_ms": round(_percentile(values, 0.95), 1),
+            "max_ms": round(values[-1], 1),
+        }
+    return stats
+
+
+def _env(workdir: str, base_url: str):
+    os.environ.update({
+        "DB_PATH": os.path.join(workdir, "data", "bench.db"),
+        "TRACE_FILE": os.path.join(workdir, "trace.jsonl"),
+        "SERPAPI_URL": f"{base_url}/search.json",
+        "SERPAPI_API_KEY": "bench",
+        "MAILJET_API_URL": f"{base_url}/",
+        "MAILJET_API_KEY": "bench",
+        "MAILJET_SECRET_KEY": "bench",
+        "SENDER_EMAIL": "digest@bench.invalid",
+        "GOOGLE_API_KEY": "bench",
+        "WRITER_BACKEND": "gemini",
+        "DAILY_BUDGET_USD": "1000000",  # never degrade mid-benchmark
+    })
+
+
+async def bench(scenario: Scenario, workdir: str, ingest_first: bool = False) -> dict:
+    os.makedirs(os.path.join(workdir, "data"), exist_ok=True)
+    os.chdir(workdir)  # research_topic appends to data/sources_log.md
+    services = FakeServices(scenario)
+    base_url = await services.start()
+    _env(workdir, base_url)
+
+    # Imported only now: several modules read the environment at import
+    import llm
+    from cache import ArticleCache
+    from db import Database
+    from fetcher import shared_fetcher
+    from ingest import ingest
+    from scheduler import run_schedular
+
+    chat = FakeChatModel(scenario.llm_latency)
+    llm.get_chat_model = lambda model=llm.DEFAULT_MODEL: chat
+
+    db = Database()
+    with db.transaction() as cursor:
+        cursor.executemany(
+            "INSERT INTO users (email, topics, otp, is_verified) VALUES (?, ?, '000000', 1)",
+            [(email, json.dumps(topics)) for email, topics in scenario.user_topics().items()]
+        )
+    report = {"scenario": scenario.as_dict(), "topics": len(scenario.topics())}
+
+    try:
+        if ingest_first:
+            for url, topic in services.feed_urls().items():
+                db.upsert_source(url, name=f"Bench {topic}", topic=topic)
+            shared_fetcher.db = db
+            shared_fetcher.cache = ArticleCache(db)
+            started = time.perf_counter()
+            report["ingest"] = await ingest(db, shared_fetcher)
+            report["ingest"]["seconds"] = round(time.perf_counter() - started, 3)
+
+        started = time.perf_counter()
+        await run_schedular()
+        elapsed = time.perf_counter() - started
+    finally:
+        await services.stop()
+
+    sent = db.conn.execute("SELECT COUNT(*) FROM users WHERE last_sent_at IS NOT NULL").fetchone()[0]
+    report.update({
+        "seconds": round(elapsed, 3),
+        "digests_sent": sent,
+        "digests_per_second": round(sent / elapsed, 2) if elapsed else None,
+        "topics_per_second": round(report["topics"] / elapsed, 2) if elapsed else None,
+        "llm_calls": chat.calls,
+        "fake_requests": dict(services.stats),
+        # ru_maxrss is in KB on Linux
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "stages": stage_stats(os.environ["TRACE_FILE"]),
+    })
+    return report
+
+
+def print_report(report: dict, top: int = 20):
+    s = report["scenario"]
+    print(f"\nusers={s['users']} topics={report['topics']} overlap={s['overlap']} page_kb={s['page_kb']}")
+    if "ingest" in report:
+        print(f"ingest: {report['ingest']}")
+    print(f"run_schedular: {report['seconds']}s, {report['digests_sent']} digests "
+          f"({report['digests_per_second']}/s), {report['topics_per_second']} topics/s, "
+          f"{report['llm_calls']} LLM calls, peak RSS {report['peak_rss_mb']} MB")
+    print(f"fake services: {report['fake_requests']}\n")
+    print(f"{'stage':<28}{'count':>8}{'total ms':>12}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}")
+    stages = sorted(report["stages"].items(), key=lambda item: -item[1]["total_ms"])
+    for name, st in stages[:top]:
+        print(f"{name:<28}{st['count']:>8}{st['total_ms']:>12}{st['p50_ms']:>10}{st['p95_ms']:>10}{st['max_ms']:>10}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the nightly run against local fakes")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--topics-per-user", type=int, default=3)
+    parser.add_argument("--overlap", type=float, default=0.5, help="0 = all topics distinct, 1 = all shared")
+    parser.add_argument("--page-kb", type=int, default=50, help="size of each fake article page")
+    parser.add_argument("--serp-latency", type=float, default=0.2, help="seconds per fake search")
+    parser.add_argument("--llm-latency", type=float, default=1.0, help="seconds per fake Gemini call")
+    parser.add_argument("--mail-latency", type=float, default=0.1, help="seconds per fake Mailjet request")
+    parser.add_argument("--ingest", action="store_true", help="poll the fake RSS feeds (full text) first")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", metavar="PATH", help="also write the report as JSON")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch directory (db, trace)")
+    args = parser.parse_args()
+
+    scenario = Scenario(users=args.users, topics_per_user=args.topics_per_user, overlap=args.overlap,
+                        page_kb=args.page_kb, serp_latency=args.serp_latency, llm_latency=args.llm_latency,
+                        mail_latency=args.mail_latency, seed=args.seed)
+    json_path = os.path.abspath(args.json) if args.json else None  # the run changes directory
+    workdir = tempfile.mkdtemp(prefix="news-agent-bench-")
+    try:
+        report = asyncio.run(bench(scenario, workdir, ingest_first=args.ingest))
+    finally:
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+    print_report(report)
+    if json_path:
+        with open(json_path, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.keep:
+        print(f"\nScratch directory kept at {workdir}")
@@ -0,0 +1,121 @@
+# src/cache.py
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+from fingerprint import simhash, to_sqlite
+from tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class LRUCache:
+    """Small in-memory LRU with an optional per-entry TTL (seconds).
+
+    Thread-safe: the event loop and worker threads (asyncio.to_thread) share instances.
+    """
+    def __init__(self, max_size: int = 1024, ttl: Optional[float] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data: "OrderedDict[Any, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None, max_age: Optional[float] = None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            stored_at, value = entry
+            age = time.monotonic() - stored_at
+            if max_age is not None and age > max_age:
+                self.misses += 1
+                return default
+            if self.ttl is not None and age > self.ttl:
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._data.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+
+class ArticleCache:
+    """URL-keyed cache of extracted article text.
+
+    An in-memory LRU sits in front of the `articles` table, so a hit skips
+    both the HTTP fetch and the HTML extraction. Entries older than `ttl_hours`
+    are refetched; the table keeps at most `max_entries` cached texts.
+    """
+    def __init__(self, db, ttl_hours: float = None, max_entries: int = None,
+                 memory_size: int = 512, evict_every: int = 100):
+        self.db = db
+        self.ttl_hours = ttl_hours if ttl_hours is not None else float(os.getenv("ARTICLE_CACHE_TTL_HOURS", 72))
+        self.max_entries = max_entries if max_entries is not None else int(os.getenv("ARTICLE_CACHE_MAX_ENTRIES", 5000))
+        self.memory = LRUCache(memory_size, ttl=self.ttl_hours * 3600)
+        self.evict_every = evict_every
+        self._writes = 0
+
+    def get(self, url: str) -> Optional[str]:
+        text = self.memory.get(url)
+        if text is not None:
+            tracer.count("cache_requests", cache="article", result="memory_hit")
+            return text
+        text = self.db.get_article_text(url, max_age_hours=self.ttl_hours)
+        if text is not None:
+            self.memory.set(url, text)
+        tracer.count("cache_requests", cache="article", result="db_hit" if text is not None else "miss")
+        return text
+
+    def validators(self, url: str) -> Optional[tuple]:
+        """(text, etag, last_modified) of an expired entry, for a conditional refetch"""
+        return self.db.get_article_validators(url)
+
+    def touch(self, url: str, text: str):
+        """The origin answered 304: the stored text is current again"""
+        self.memory.set(url, text)
+        self.db.touch_article_text(url)
+
+    def set(self, url: str, text: str, etag: str = None, last_modified: str = None):
+        if not text:
+            return
+        self.memory.set(url, text)
+        # Fingerprinted at scrape time so syndicated copies can be clustered later
+        self.db.save_article_text(url, text, etag, last_modified, fingerprint=to_sqlite(simhash(text)))
+        self._writes += 1
+        if self._writes % self.evict_every == 0:
+            self.evict()
+
+    def evict(self):
+        evicted = self.db.evict_article_text(self.max_entries)
+        if evicted:
+            logger.info(f"Evicted {evicted} cached article texts")
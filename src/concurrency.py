@@ -0,0 +1,211 @@
+# src/concurrency.py
+import asyncio
+import logging
+import os
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+from resilience import Call, CircuitOpen, ProviderPolicy, is_throttle, policies_from_env
+
+logger = logging.getLogger(__name__)
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return max(1, int(os.getenv(name, default)))
+    except ValueError:
+        logger.warning(f"Ignoring invalid {name}={os.getenv(name)!r}, using {default}")
+        return default
+
+
+class ConcurrencyLimiter:
+    """Layered concurrency limits: global jobs and per-provider calls.
+
+    `job()` bounds how many units of pipeline work (a topic, a digest send) run
+    at once. `provider()` bounds in-flight calls to one external API and is meant
+    to be taken *inside* a job, never around one, so the two layers cannot
+    deadlock. asyncio semaphores wake waiters in FIFO order, which keeps
+    scheduling fair under contention. Providers with a policy also get a
+    request rate limit and a circuit breaker (see resilience.py).
+    """
+    def __init__(self, global_limit: int = 20, provider_limits: Optional[Dict[str, int]] = None,
+                 policies: Optional[Dict[str, ProviderPolicy]] = None):
+        self.global_limit = global_limit
+        self.provider_limits = dict(provider_limits or {})
+        self.policies = dict(policies or {})
+        self._global = asyncio.Semaphore(global_limit)
+        self._providers = {name: asyncio.Semaphore(limit) for name, limit in self.provider_limits.items()}
+
+    @classmethod
+    def from_env(cls) -> "ConcurrencyLimiter":
+        return cls(
+            global_limit=_env_int("MAX_CONCURRENCY", 20),
+            provider_limits={
+                "serpapi": _env_int("SERPAPI_CONCURRENCY", 5),
+                "gemini": _env_int("GEMINI_CONCURRENCY", 5),
+                "mailjet": _env_int("MAILJET_CONCURRENCY", 10),
+                "openai": _env_int("OPENAI_CONCURRENCY", 5),
+            },
+            policies=policies_from_env(),
+        )
+
+    def share_rates(self, processes: int):
+        """Give this process 1/processes of every provider's request rate.
+
+        Buckets live in one process; when several processes call the same
+        providers (scheduler workers), each takes its share so the combined
+        rate stays at <PROVIDER>_RATE.
+        """
+        if processes > 1:
+            for policy in self.policies.values():
+                if policy.bucket is not None:
+                    policy.bucket.scale(1 / processes)
+
+    @asynccontextmanager
+    async def job(self):
+        """Hold a global slot for one unit of work"""
+        async with self._global:
+            yield
+
+    @asynccontextmanager
+    async def provider(self, name: str):
+        """Hold one in-flight call slot for an external provider.
+
+        Yields a resilience.Call the caller can mark throttled (429) or
+        failed (5xx); an exception escaping the block is classified the same
+        way. Raises CircuitOpen straight away while the provider is failing.
+        """
+        policy = self.policies.get(name)
+        sem = self._providers.get(name)
+        async with sem if sem is not None else _no_limit():
+            call = Call()
+            if policy is None:
+                yield call
+                return
+            try:
+                policy.breaker.check()
+                if policy.bucket is not None:
+                    await policy.bucket.acquire()
+                yield call
+            except CircuitOpen:
+                raise
+            except asyncio.CancelledError:
+                policy.breaker.release()
+                raise
+            except Exception as e:
+                if is_throttle(e):
+                    call.throttled()
+                else:
+                    call.failed(e)
+                policy.record(call)
+                raise
+            policy.record(call)
+
+
+@asynccontextmanager
+async def _no_limit():
+    yield
+
+
+async def run_bounded(items: Iterable[Any], worker: Callable[[Any], Awaitable[Any]],
+                      concurrency: int, queue_size: Optional[int] = None) -> List[Any]:
+    """Run `worker` over `items` with a fixed pool of tasks fed by a bounded queue.
+
+    The producer blocks while the queue is full, so huge inputs (or lazy
+    iterators) are never materialized as thousands of pending tasks. Results
+    come back in input order; a worker exception is returned in its slot
+    rather than cancelling the rest of the batch.
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size or concurrency * 2)
+    results: Dict[int, Any] = {}
+
+    async def consume():
+        while True:
+            entry = await queue.get()
+            try:
+                if entry is None:
+                    return
+                i, item = entry
+                try:
+                    results[i] = await worker(item)
+                except Exception as e:
+                    results[i] = e
+            finally:
+                queue.task_done()
+
+    workers = [asyncio.create_task(consume()) for _ in range(max(1, concurrency))]
+    try:
+        count = 0
+        for count, item in enumerate(items, start=1):
+            await queue.put((count - 1, item))
+        for _ in workers:
+            await queue.put(None)
+        await asyncio.gather(*workers)
+    finally:
+        for task in workers:
+            task.cancel()
+    return [results[i] for i in range(count)]
+
+
+class BackgroundQueue:
+    """Fire-and-forget work queue for request handlers.
+
+    `submit()` returns immediately; a few worker tasks, started on first use
+    in the running loop, drain the queue. A job that raises or returns False
+    is retried with exponential backoff, then logged and dropped.
+    """
+    def __init__(self, workers: int = 2, maxsize: int = 1000, retries: int = 3,
+                 backoff_seconds: float = 2.0):
+        self.workers = workers
+        self.maxsize = maxsize
+        self.retries = retries
+        self.backoff_seconds = backoff_seconds
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    def submit(self, fn: Callable[..., Awaitable[Any]], *args, **kwargs) -> bool:
+        """Queue `await fn(*args, **kwargs)`; False when the queue is full"""
+        if self._queue is None:
+            self._queue = asyncio.Queue(self.maxsize)
+            self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        try:
+            self._queue.put_nowait((fn, args, kwargs))
+            return True
+        except asyncio.QueueFull:
+            logger.error(f"Background queue full, dropping {getattr(fn, '__name__', fn)}")
+            return False
+
+    async def _work(self):
+        while True:
+            fn, args, kwargs = await self._queue.get()
+            try:
+                await self._run(fn, args, kwargs)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, fn, args, kwargs):
+        name = getattr(fn, '__name__', fn)
+        for attempt in range(self.retries + 1):
+            try:
+                if await fn(*args, **kwargs) is not False:
+                    return
+                error = "returned False"
+            except Exception as e:
+                error = e
+            if attempt < self.retries:
+                await asyncio.sleep(self.backoff_seconds * 2 ** attempt)
+        logger.error(f"Background job {name} failed after {self.retries + 1} attempts: {error}")
+
+    async def join(self):
+        """Wait until everything submitted so far has finished"""
+        if self._queue is not None:
+            await self._queue.join()
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._queue, self._tasks = None, []
+
+
+# Shared limiter for the process; graph nodes, the mailer and the scheduler all draw from it
+limits = ConcurrencyLimiter.from_env()
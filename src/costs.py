@@ -0,0 +1,118 @@
+# src/costs.py
+import logging
+import os
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+# USD per 1M (input, output) tokens
+TOKEN_PRICING: Dict[str, Tuple[float, float]] = {
+    "gemini-3-pro-preview": (2.00, 12.00),
+    "gemini-2.5-flash": (0.30, 2.50),
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+}
+# Models missing above (e.g. a CHEAP_MODEL override) are charged the highest known rates, not nothing
+FALLBACK_PRICING = (max(p[0] for p in TOKEN_PRICING.values()), max(p[1] for p in TOKEN_PRICING.values()))
+# USD per call for non-token providers
+CALL_PRICING: Dict[str, float] = {
+    "serpapi": float(os.getenv("SERPAPI_COST_PER_SEARCH", 0.015)),
+}
+
+# Budget states
+OK = "ok"
+TIGHT = "tight"
+EXHAUSTED = "exhausted"
+
+
+def token_usage(response) -> Tuple[int, int]:
+    """(input, output) tokens from a LangChain message or an OpenAI completion"""
+    usage = getattr(response, "usage_metadata", None)
+    if usage:
+        return usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        return getattr(usage, "prompt_tokens", 0) or 0, getattr(usage, "completion_tokens", 0) or 0
+    return 0, 0
+
+
+_unpriced = set()
+
+
+def estimate_cost(model: str, tokens_in: int, tokens_out: int) -> float:
+    pricing = TOKEN_PRICING.get(model)
+    if pricing is None:
+        if model not in _unpriced:
+            _unpriced.add(model)
+            logger.warning(f"No token pricing for {model!r}, charging {FALLBACK_PRICING} USD per 1M tokens")
+        pricing = FALLBACK_PRICING
+    price_in, price_out = pricing
+    return (tokens_in * price_in + tokens_out * price_out) / 1_000_000
+
+
+class CostTracker:
+    """Per-call token and cost accounting, persisted per day, provider, model and topic.
+
+    Totals live in the `usage` table so the web app, the scheduler and any
+    worker processes share one daily budget. `budget_state()` turns the day's
+    spend into OK / TIGHT (past `tight_ratio` of the budget) / EXHAUSTED,
+    which callers use to degrade: smaller context, cheaper model, or a
+    cached summary.
+    """
+    def __init__(self, db=None, budget_daily: float = None, tight_ratio: float = 0.8):
+        self.db = db
+        self.budget_daily = budget_daily if budget_daily is not None else float(os.getenv("DAILY_BUDGET_USD", 1.0))
+        self.tight_ratio = tight_ratio
+        self._local_spend: Dict[str, float] = {}  # used when no database is attached
+
+    def record(self, provider: str, model: str = "", topic: str = "", tokens_in: int = 0,
+               tokens_out: int = 0, calls: int = 1) -> float:
+        if model:
+            cost = estimate_cost(model, tokens_in, tokens_out)
+        else:
+            cost = CALL_PRICING.get(provider, 0.0) * calls
+        tracer.count("provider_calls", calls, provider=provider)
+        if tokens_in or tokens_out:
+            tracer.count("tokens", tokens_in, provider=provider, model=model, direction="in")
+            tracer.count("tokens", tokens_out, provider=provider, model=model, direction="out")
+        tracer.count("cost_usd", cost, provider=provider)
+        day = datetime.now().strftime("%Y-%m-%d")
+        if self.db is not None:
+            self.db.record_usage(day, provider, model or "", topic or "", calls, tokens_in, tokens_out, cost)
+        else:
+            self._local_spend[day] = self._local_spend.get(day, 0.0) + cost
+        return cost
+
+    def record_response(self, provider: str, model: str, response, topic: str = "") -> float:
+        tokens_in, tokens_out = token_usage(response)
+        return self.record(provider, model, topic, tokens_in, tokens_out)
+
+    def spent_today(self) -> float:
+        day = datetime.now().strftime("%Y-%m-%d")
+        if self.db is not None:
+            return self.db.spend_for_day(day)
+        return self._local_spend.get(day, 0.0)
+
+    def can_process(self, estimated_cost: float) -> bool:
+        return self.spent_today() + estimated_cost <= self.budget_daily
+
+    def budget_state(self) -> str:
+        spent = self.spent_today()
+        if spent >= self.budget_daily:
+            return EXHAUSTED
+        if spent >= self.budget_daily * self.tight_ratio:
+            return TIGHT
+        return OK
+
+    def report(self, day: Optional[str] = None):
+        """Rows of (provider, model, topic, calls, tokens_in, tokens_out, cost) for a day"""
+        if self.db is None:
+            return []
+        return self.db.usage_for_day(day or datetime.now().strftime("%Y-%m-%d"))
+
+
+# Process-wide tracker; entry points attach their Database to make totals persistent
+cost_tracker = CostTracker()
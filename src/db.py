@@ -1,13 +1,88 @@
 # src/db.py
+import asyncio
+import hashlib
+import os
+import re
 import sqlite3
-from datetime import datetime
-from typing import Optional
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
 
+from tracing import trace_methods
+
+_SEARCH_TERM = re.compile(r"\w+")
+# Too common to narrow an AND query; dropped from search terms
+_STOPWORDS = {"a", "an", "and", "the", "of", "in", "on", "for", "to", "with", "or", "vs", "news"}
+
+@trace_methods("db", exclude=("transaction", "run", "close"))
 class Database:
-    def __init__(self, db_path="data/history.db"):
-        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+    """SQLite store shared by the web app, the scheduler and the fetchers.
+
+    Each thread gets its own connection (the database runs in WAL mode, so
+    readers never wait on the writer). Single-row helpers commit on their own;
+    wrap several calls in `transaction()` to pay for one commit instead.
+    """
+    def __init__(self, db_path=None):
+        self.db_path = db_path or os.getenv("DB_PATH", "data/history.db")
+        self._local = threading.local()
+        self._shared = None
+        if db_path == ":memory:":
+            # Every connection to :memory: is a separate database, so share one
+            self._shared = self._connect()
         self.create_tables()
     
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, check_same_thread=self.db_path != ":memory:", timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")  # safe with WAL, fsyncs only at checkpoints
+        conn.execute("PRAGMA busy_timeout=30000")
+        return conn
+    
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """This thread's connection, opened on first use"""
+        if self._shared is not None:
+            return self._shared
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+        return conn
+    
+    def _commit(self):
+        # Inside transaction() the outermost block commits
+        if not getattr(self._local, "depth", 0):
+            self.conn.commit()
+    
+    @contextmanager
+    def transaction(self):
+        """Group several writes into one commit; nests safely"""
+        conn = self.conn
+        depth = getattr(self._local, "depth", 0)
+        self._local.depth = depth + 1
+        try:
+            yield conn.cursor()
+        except Exception:
+            if depth == 0:
+                conn.rollback()
+            raise
+        else:
+            if depth == 0:
+                conn.commit()
+        finally:
+            self._local.depth = depth
+    
+    async def run(self, fn, *args, **kwargs):
+        """Run a Database method on a worker thread (with that thread's connection)"""
+        return await asyncio.to_thread(fn, *args, **kwargs)
+    
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+    
     def create_tables(self):
         cursor = self.conn.cursor()
         cursor.execute('''
@@ -45,13 +120,162 @@ class Database:
                 last_sent_at TIMESTAMP
             )
         ''')
-        self.conn.commit()
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                model TEXT,
+                topic TEXT,
+                response TEXT,
+                created_at TIMESTAMP,
+                last_used_at TIMESTAMP
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS usage (
+                day TEXT,
+                provider TEXT,
+                model TEXT,
+                topic TEXT,
+                calls INTEGER DEFAULT 0,
+                tokens_in INTEGER DEFAULT 0,
+                tokens_out INTEGER DEFAULT 0,
+                cost REAL DEFAULT 0,
+                PRIMARY KEY (day, provider, model, topic)
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                run_date TEXT,
+                kind TEXT,
+                key TEXT,
+                payload TEXT,
+                state TEXT,
+                result TEXT,
+                error TEXT,
+                attempts INTEGER DEFAULT 0,
+                next_attempt_at TIMESTAMP,
+                lease_owner TEXT,
+                lease_expires TIMESTAMP,
+                updated_at TIMESTAMP,
+                UNIQUE (run_date, kind, key)
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS topic_state (
+                topic TEXT PRIMARY KEY, -- normalized
+                summary TEXT,
+                updated_at TIMESTAMP
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS topic_seen (
+                topic TEXT,
+                link TEXT,
+                fingerprint INTEGER,
+                seen_at TIMESTAMP,
+                PRIMARY KEY (topic, link)
+            )
+        ''')
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_jobs_state ON jobs (run_date, kind, state)"
+        )
+        # get_due_users walks verified users in email order; last_sent_at is
+        # carried so the due filter is checked in the index, without a sort
+        cursor.execute("DROP INDEX IF EXISTS idx_users_due")  # was (is_verified, last_sent_at)
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_users_due_by_email ON users (is_verified, email, last_sent_at)"
+        )
+        self._add_missing_columns(cursor, 'articles', {
+            'fetched_at': 'TIMESTAMP',
+            'etag': 'TEXT',
+            'last_modified': 'TEXT',
+            'fingerprint': 'INTEGER',  # SimHash of full_text, see fingerprint.py
+        })
+        self._add_missing_columns(cursor, 'llm_cache', {
+            'kind': 'TEXT',
+        })
+        self._add_missing_columns(cursor, 'sources', {
+            'etag': 'TEXT',
+            'last_modified': 'TEXT',
+        })
+        self._create_search_index(cursor)
+        self._commit()
+    
+    def _create_search_index(self, cursor):
+        """FTS5 index over article title, summary and text, kept in sync by triggers"""
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'articles_fts'")
+        exists = cursor.fetchone() is not None
+        cursor.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS articles_fts USING fts5(
+                title, summary, full_text,
+                content='articles', content_rowid='rowid',
+                tokenize='porter unicode61'
+            )
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS articles_fts_insert AFTER INSERT ON articles BEGIN
+                INSERT INTO articles_fts (rowid, title, summary, full_text)
+                VALUES (new.rowid, new.title, new.summary, new.full_text);
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS articles_fts_delete AFTER DELETE ON articles BEGIN
+                INSERT INTO articles_fts (articles_fts, rowid, title, summary, full_text)
+                VALUES ('delete', old.rowid, old.title, old.summary, old.full_text);
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS articles_fts_update AFTER UPDATE OF title, summary, full_text ON articles BEGIN
+                INSERT INTO articles_fts (articles_fts, rowid, title, summary, full_text)
+                VALUES ('delete', old.rowid, old.title, old.summary, old.full_text);
+                INSERT INTO articles_fts (rowid, title, summary, full_text)
+                VALUES (new.rowid, new.title, new.summary, new.full_text);
+            END
+        ''')
+        if not exists:
+            # Index whatever was stored before the index existed
+            cursor.execute("INSERT INTO articles_fts (articles_fts) VALUES ('rebuild')")
+    
+    def _add_missing_columns(self, cursor, table: str, columns: dict):
+        """Lightweight migration for databases created before a column existed"""
+        cursor.execute(f"PRAGMA table_info({table})")
+        existing = {row[1] for row in cursor.fetchall()}
+        for name, col_type in columns.items():
+            if name not in existing:
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN {name} {col_type}")
     
     def article_exists(self, article_id: str) -> bool:
         cursor = self.conn.cursor()
         cursor.execute("SELECT 1 FROM articles WHERE id = ?", (article_id,))
         return cursor.fetchone() is not None
     
+    def get_fingerprints(self, links: list) -> Dict[str, int]:
+        """{link: stored SimHash} for the links whose full text has been fingerprinted"""
+        found = {}
+        cursor = self.conn.cursor()
+        links = list(links)
+        for i in range(0, len(links), 500):  # stay under SQLite's bound-variable limit
+            chunk = links[i:i + 500]
+            placeholders = ",".join("?" * len(chunk))
+            cursor.execute(
+                f"SELECT link, fingerprint FROM articles WHERE link IN ({placeholders}) AND fingerprint IS NOT NULL",
+                chunk)
+            found.update(cursor.fetchall())
+        return found
+
+    def articles_exist_many(self, article_ids: list) -> set:
+        """Subset of article_ids already stored, in one query per chunk"""
+        existing = set()
+        cursor = self.conn.cursor()
+        ids = list(article_ids)
+        for i in range(0, len(ids), 500):  # stay under SQLite's bound-variable limit
+            chunk = ids[i:i + 500]
+            placeholders = ",".join("?" * len(chunk))
+            cursor.execute(f"SELECT id FROM articles WHERE id IN ({placeholders})", chunk)
+            existing.update(row[0] for row in cursor.fetchall())
+        return existing
+    
     def insert_article(self, article_data: dict):
         cursor = self.conn.cursor()
         cursor.execute('''
@@ -68,7 +292,272 @@ class Database:
             article_data.get('topic'),
             article_data.get('published')
         ))
-        self.conn.commit()
+        self._commit()
+
+    def insert_articles_many(self, articles: Iterable[dict]) -> int:
+        """Insert a batch of articles in one transaction; returns how many were new.
+        
+        Known links only get missing metadata filled in and are not counted:
+        
+        >>> db = Database(":memory:")
+        >>> db.insert_articles_many([{'id': 'a', 'title': 'A', 'link': 'https://a.example/1'}])
+        1
+        >>> db.insert_articles_many([{'id': 'b', 'title': 'B', 'link': 'https://b.example/1'},
+        ...                          {'id': 'a', 'title': 'A', 'link': 'https://a.example/1'}])
+        1
+        """
+        rows = [(
+            a['id'],
+            a['title'],
+            a['link'],
+            a.get('summary'),
+            a.get('full_text'),
+            a.get('source_name'),
+            a.get('topic'),
+            a.get('published')
+        ) for a in articles]
+        with self.transaction() as cursor:
+            # New rows get rowids above the current maximum; total_changes would also
+            # count the FTS trigger writes and the upserts of known links
+            before = cursor.execute("SELECT COALESCE(MAX(rowid), 0) FROM articles").fetchone()[0]
+            # A link first seen by the scrape cache gets its feed metadata filled in
+            cursor.executemany('''
+                INSERT INTO articles 
+                (id, title, link, summary, full_text, source_name, topic, published)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(link) DO UPDATE SET
+                    title=COALESCE(articles.title, excluded.title),
+                    summary=COALESCE(articles.summary, excluded.summary),
+                    full_text=COALESCE(articles.full_text, excluded.full_text),
+                    source_name=COALESCE(articles.source_name, excluded.source_name),
+                    topic=COALESCE(articles.topic, excluded.topic),
+                    published=COALESCE(articles.published, excluded.published)
+                ON CONFLICT DO NOTHING
+            ''', rows)
+            return cursor.execute("SELECT COUNT(*) FROM articles WHERE rowid > ?", (before,)).fetchone()[0]
+    
+    def search_articles(self, topic: str, since: Optional[datetime] = None, limit: int = 10) -> List[tuple]:
+        """Stored articles matching every term of a topic, best BM25 match first.
+        
+        Returns (title, link, summary, excerpt, fingerprint) rows; title matches weigh most,
+        then the feed summary, then the extracted text. `since` (naive UTC, like the
+        stored times) drops articles published (or first stored) before that time.
+        """
+        terms = [t for t in _SEARCH_TERM.findall(topic.lower()) if t not in _STOPWORDS]
+        if not terms:
+            return []
+        query = " ".join(f'"{t}"' for t in terms)
+        sql = '''
+            SELECT a.title, a.link, a.summary,
+                   snippet(articles_fts, 2, '', '', '...', 48), a.fingerprint
+            FROM articles_fts
+            JOIN articles a ON a.rowid = articles_fts.rowid
+            WHERE articles_fts MATCH ?
+        '''
+        params = [query]
+        if since is not None:
+            sql += " AND COALESCE(a.published, a.processed_at) >= ?"
+            params.append(since)
+        sql += " ORDER BY bm25(articles_fts, 10.0, 4.0, 1.0) LIMIT ?"
+        params.append(limit)
+        cursor = self.conn.cursor()
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+    
+    def get_article_text(self, link: str, max_age_hours: float) -> Optional[str]:
+        """Cached extracted text for a URL, if fetched within max_age_hours"""
+        cutoff = datetime.now() - timedelta(hours=max_age_hours)
+        cursor = self.conn.cursor()
+        cursor.execute(
+            "SELECT full_text FROM articles WHERE link = ? AND full_text IS NOT NULL AND fetched_at >= ?",
+            (link, cutoff)
+        )
+        row = cursor.fetchone()
+        return row[0] if row else None
+    
+    def get_article_validators(self, link: str) -> Optional[tuple]:
+        """(full_text, etag, last_modified) for a cached URL regardless of age"""
+        cursor = self.conn.cursor()
+        cursor.execute(
+            "SELECT full_text, etag, last_modified FROM articles WHERE link = ? AND full_text IS NOT NULL",
+            (link,)
+        )
+        return cursor.fetchone()
+    
+    def save_article_text(self, link: str, full_text: str, etag: str = None, last_modified: str = None,
+                          fingerprint: int = None):
+        """Store extracted text for a URL, creating a content-addressed row if needed.
+        
+        `fingerprint` is the text's SimHash already folded into SQLite's
+        signed range (fingerprint.to_sqlite).
+        """
+        article_id = hashlib.sha256(link.encode('utf-8')).hexdigest()
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            INSERT INTO articles (id, link, full_text, fetched_at, etag, last_modified, fingerprint)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(link) DO UPDATE SET
+                full_text=excluded.full_text,
+                fetched_at=excluded.fetched_at,
+                etag=excluded.etag,
+                last_modified=excluded.last_modified,
+                fingerprint=excluded.fingerprint
+        ''', (article_id, link, full_text, datetime.now(), etag, last_modified, fingerprint))
+        self._commit()
+    
+    def touch_article_text(self, link: str):
+        """Mark cached text as fresh again after a 304 revalidation"""
+        cursor = self.conn.cursor()
+        cursor.execute("UPDATE articles SET fetched_at = ? WHERE link = ?", (datetime.now(), link))
+        self._commit()
+    
+    def evict_article_text(self, max_entries: int) -> int:
+        """Drop cached text beyond the newest max_entries; the article rows are kept"""
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            UPDATE articles SET full_text = NULL, fetched_at = NULL
+            WHERE id IN (
+                SELECT id FROM articles WHERE fetched_at IS NOT NULL
+                ORDER BY fetched_at DESC LIMIT -1 OFFSET ?
+            )
+        ''', (max_entries,))
+        self._commit()
+        return cursor.rowcount
+    
+    def get_active_sources(self) -> List[tuple]:
+        """(url, name, topic) for every feed that should be polled"""
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT url, name, topic FROM sources WHERE is_active = 1")
+        return cursor.fetchall()
+    
+    def upsert_source(self, url: str, name: str = None, topic: str = None, is_active: bool = True):
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            INSERT INTO sources (url, name, topic, is_active) VALUES (?, ?, ?, ?)
+            ON CONFLICT(url) DO UPDATE SET
+                name=COALESCE(excluded.name, sources.name),
+                topic=COALESCE(excluded.topic, sources.topic),
+                is_active=excluded.is_active
+        ''', (url, name, topic, int(is_active)))
+        self._commit()
+    
+    def get_source_validators(self, url: str) -> tuple:
+        """(etag, last_modified) from the last successful fetch of a feed"""
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT etag, last_modified FROM sources WHERE url = ?", (url,))
+        return cursor.fetchone() or (None, None)
+    
+    def record_source_fetch(self, url: str, etag: str = None, last_modified: str = None):
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            INSERT INTO sources (url, last_fetched, etag, last_modified)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(url) DO UPDATE SET
+                last_fetched=excluded.last_fetched,
+                etag=COALESCE(excluded.etag, sources.etag),
+                last_modified=COALESCE(excluded.last_modified, sources.last_modified)
+        ''', (url, datetime.now(), etag, last_modified))
+        self._commit()
+
+    def get_llm_response(self, key: str, max_age_hours: float) -> Optional[str]:
+        cutoff = datetime.now() - timedelta(hours=max_age_hours)
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT response FROM llm_cache WHERE key = ? AND created_at >= ?", (key, cutoff))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        cursor.execute("UPDATE llm_cache SET last_used_at = ? WHERE key = ?", (datetime.now(), key))
+        self._commit()
+        return row[0]
+    
+    def save_llm_response(self, key: str, response: str, model: str = None, topic: str = None,
+                          kind: str = None):
+        now = datetime.now()
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            INSERT OR REPLACE INTO llm_cache (key, model, topic, kind, response, created_at, last_used_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (key, model, topic, kind, response, now, now))
+        self._commit()
+    
+    def latest_llm_response(self, topic: str, kind: str) -> Optional[str]:
+        """Most recent cached response of a kind for a normalized topic, however old"""
+        cursor = self.conn.cursor()
+        cursor.execute(
+            "SELECT response FROM llm_cache WHERE topic = ? AND kind = ? ORDER BY created_at DESC LIMIT 1",
+            (topic, kind)
+        )
+        row = cursor.fetchone()
+        return row[0] if row else None
+    
+    def evict_llm_responses(self, max_entries: int) -> int:
+        """Keep only the max_entries most recently used responses"""
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            DELETE FROM llm_cache WHERE key IN (
+                SELECT key FROM llm_cache ORDER BY last_used_at DESC LIMIT -1 OFFSET ?
+            )
+        ''', (max_entries,))
+        self._commit()
+        return cursor.rowcount
+
+    def record_usage(self, day: str, provider: str, model: str, topic: str, calls: int,
+                     tokens_in: int, tokens_out: int, cost: float):
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            INSERT INTO usage (day, provider, model, topic, calls, tokens_in, tokens_out, cost)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(day, provider, model, topic) DO UPDATE SET
+                calls=calls + excluded.calls,
+                tokens_in=tokens_in + excluded.tokens_in,
+                tokens_out=tokens_out + excluded.tokens_out,
+                cost=cost + excluded.cost
+        ''', (day, provider, model, topic, calls, tokens_in, tokens_out, cost))
+        self._commit()
+    
+    def spend_for_day(self, day: str) -> float:
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT COALESCE(SUM(cost), 0) FROM usage WHERE day = ?", (day,))
+        return cursor.fetchone()[0]
+    
+    def usage_for_day(self, day: str) -> List[tuple]:
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            SELECT provider, model, topic, calls, tokens_in, tokens_out, cost
+            FROM usage WHERE day = ? ORDER BY cost DESC
+        ''', (day,))
+        return cursor.fetchall()
+
+    def get_topic_state(self, topic: str) -> Optional[tuple]:
+        """(summary, updated_at) of the last briefing written for a normalized topic"""
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT summary, updated_at FROM topic_state WHERE topic = ?", (topic,))
+        return cursor.fetchone()
+    
+    def get_topic_seen(self, topic: str, since: datetime) -> List[tuple]:
+        """(link, fingerprint) of results already summarized for a topic since a time"""
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT link, fingerprint FROM topic_seen WHERE topic = ? AND seen_at >= ?", (topic, since))
+        return cursor.fetchall()
+    
+    def record_topic_summary(self, topic: str, summary: str, seen: Iterable[tuple],
+                             forget_before: datetime = None):
+        """Store a topic's new briefing and the (link, fingerprint) pairs it covered.
+        
+        Entries last seen before `forget_before` are dropped in the same transaction.
+        """
+        now = datetime.now()
+        with self.transaction() as cursor:
+            cursor.execute('''
+                INSERT INTO topic_state (topic, summary, updated_at) VALUES (?, ?, ?)
+                ON CONFLICT(topic) DO UPDATE SET summary=excluded.summary, updated_at=excluded.updated_at
+            ''', (topic, summary, now))
+            cursor.executemany('''
+                INSERT INTO topic_seen (topic, link, fingerprint, seen_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT(topic, link) DO UPDATE SET fingerprint=excluded.fingerprint, seen_at=excluded.seen_at
+            ''', [(topic, link, fingerprint, now) for link, fingerprint in seen])
+            if forget_before is not None:
+                cursor.execute("DELETE FROM topic_seen WHERE topic = ? AND seen_at < ?", (topic, forget_before))
 
     def upsert_user(self, email: str, topics: str, otp: str):
         cursor = self.conn.cursor()
@@ -81,12 +570,12 @@ class Database:
                 otp_created_at=excluded.otp_created_at,
                 is_verified=0
         ''', (email, topics, otp, datetime.now()))
-        self.conn.commit()
+        self._commit()
 
     def verify_user(self, email: str) -> bool:
         cursor = self.conn.cursor()
         cursor.execute("UPDATE users SET is_verified = 1 WHERE email = ?", (email,))
-        self.conn.commit()
+        self._commit()
         return cursor.rowcount > 0
 
     def get_user_otp(self, email: str) -> Optional[tuple]:
@@ -99,7 +588,32 @@ class Database:
         cursor.execute("SELECT email, topics, last_sent_at FROM users WHERE is_verified = 1")
         return cursor.fetchall()
 
+    def get_due_users(self, now: datetime, window: timedelta, limit: int = 500,
+                      cursor: Optional[str] = None) -> List[tuple]:
+        """Verified users not sent to within `window`, as (email, topics) pages.
+        
+        Keyset-paginated by email: pass the last email of a page as `cursor`
+        to get the next one.
+        """
+        cutoff = now - window
+        cur = self.conn.cursor()
+        cur.execute('''
+            SELECT email, topics FROM users
+            WHERE is_verified = 1
+              AND (last_sent_at IS NULL OR last_sent_at <= ?)
+              AND email > ?
+            ORDER BY email
+            LIMIT ?
+        ''', (cutoff, cursor or "", limit))
+        return cur.fetchall()
+
     def update_last_sent(self, email: str):
         cursor = self.conn.cursor()
         cursor.execute("UPDATE users SET last_sent_at = ? WHERE email = ?", (datetime.now(), email))
-        self.conn.commit()
+        self._commit()
+    
+    def update_last_sent_many(self, emails: List[str]):
+        now = datetime.now()
+        with self.transaction() as cursor:
+            cursor.executemany("UPDATE users SET last_sent_at = ? WHERE email = ?",
+                               [(now, email) for email in emails])
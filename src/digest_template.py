@@ -0,0 +1,173 @@
+# src/digest_template.py
+import html
+import re
+from typing import Dict, Iterable, Iterator
+
+from cache import LRUCache
+
+# Static shell, built once at import
+HEAD = """<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="utf-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <style>
+        body { font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, Helvetica, Arial, sans-serif; line-height: 1.6; color: #374151; background-color: #f3f4f6; margin: 0; padding: 0; }
+        .container { max-width: 600px; margin: 0 auto; background-color: #ffffff; }
+        .header { background-color: #2563eb; color: #ffffff; padding: 30px 20px; text-align: center; }
+        .header h1 { margin: 0; font-size: 24px; font-weight: 700; }
+        .meta { font-size: 14px; opacity: 0.9; margin-top: 10px; }
+        .content { padding: 30px 20px; }
+        .topic-card { margin-bottom: 30px; border-bottom: 1px solid #e5e7eb; padding-bottom: 30px; }
+        .topic-card:last-child { border-bottom: none; }
+        .topic-header { color: #111827; font-size: 20px; font-weight: 600; margin-bottom: 15px; text-transform: capitalize; border-left: 4px solid #2563eb; padding-left: 12px; }
+        .summary-content { font-size: 16px; color: #4b5563; }
+        .summary-content h3, .summary-content h4 { color: #1f2937; margin: 16px 0 8px; }
+        .footer { background-color: #f9fafb; padding: 20px; text-align: center; font-size: 12px; color: #9ca3af; border-top: 1px solid #e5e7eb; }
+        a { color: #2563eb; text-decoration: none; }
+        strong { color: #1f2937; }
+    </style>
+</head>
+<body>
+    <div class="container">
+"""
+
+HEADER = """        <div class="header">
+            <h1>Daily Intelligence Briefing</h1>
+            <div class="meta">{date} &bull; {article_count} Topics Analyzed</div>
+        </div>
+        <div class="content">
+"""
+
+CARD = """            <div class="topic-card">
+                <div class="topic-header">{topic}</div>
+                <div class="summary-content">
+{body}
+                </div>
+            </div>
+"""
+
+FOOTER = """        </div>
+        <div class="footer">
+            <p>Generated by News Agent AI. Sources verified.</p>
+            <p>To unsubscribe, please reply to this email.</p>
+        </div>
+    </div>
+</body>
+</html>
+"""
+
+_HEADING = re.compile(r"^(#{1,6})\s+(.*)$")
+_BULLET = re.compile(r"^\s*[-*+]\s+(.*)$")
+_NUMBERED = re.compile(r"^\s*\d+[.)]\s+(.*)$")
+_LINK = re.compile(r"\[([^\]]+)\]\((https?://[^)\s]+)\)")
+_BOLD = re.compile(r"\*\*(.+?)\*\*|__(.+?)__")
+_ITALIC = re.compile(r"(?<![*\w])\*(?!\s)(.+?)(?<!\s)\*(?![*\w])")
+_CODE = re.compile(r"`([^`]+)`")
+_HTML_BLOCK = re.compile(r"<(p|div|ul|ol|li|h[1-6]|br|table|strong|em|a)\b", re.IGNORECASE)
+
+
+def _inline(text: str) -> str:
+    text = html.escape(text, quote=False)
+    text = _CODE.sub(r"<code>\1</code>", text)
+    text = _LINK.sub(lambda m: f'<a href="{m.group(2).replace(chr(34), "%22")}">{m.group(1)}</a>', text)
+    text = _BOLD.sub(lambda m: f"<strong>{m.group(1) or m.group(2)}</strong>", text)
+    text = _ITALIC.sub(r"<em>\1</em>", text)
+    return text
+
+
+def iter_markdown_html(lines: Iterable[str]) -> Iterator[str]:
+    """Convert markdown to HTML one line at a time, yielding fragments.
+
+    Handles the subset the writers produce: headings, bullet and numbered
+    lists, paragraphs, fenced code, bold/italic, inline code and links.
+    """
+    open_list = None   # "ul" / "ol" while inside a list
+    paragraph = []
+    in_code = False
+
+    def close_paragraph():
+        if paragraph:
+            yield "<p>" + " ".join(paragraph) + "</p>"
+            paragraph.clear()
+
+    def close_list():
+        nonlocal open_list
+        if open_list:
+            yield f"</{open_list}>"
+            open_list = None
+
+    for raw in lines:
+        line = raw.rstrip("\n")
+        if line.strip().startswith("```"):
+            yield from close_paragraph()
+            yield from close_list()
+            yield "</code></pre>" if in_code else "<pre><code>"
+            in_code = not in_code
+            continue
+        if in_code:
+            yield html.escape(line, quote=False) + "\n"
+            continue
+        if not line.strip():
+            yield from close_paragraph()
+            yield from close_list()
+            continue
+
+        heading = _HEADING.match(line)
+        bullet = _BULLET.match(line)
+        numbered = None if bullet else _NUMBERED.match(line)
+        if heading:
+            yield from close_paragraph()
+            yield from close_list()
+            level = min(len(heading.group(1)) + 2, 6)  # keep headings below the card title
+            yield f"<h{level}>{_inline(heading.group(2))}</h{level}>"
+        elif bullet or numbered:
+            yield from close_paragraph()
+            kind = "ul" if bullet else "ol"
+            if open_list != kind:
+                yield from close_list()
+                yield f"<{kind}>"
+                open_list = kind
+            yield f"<li>{_inline((bullet or numbered).group(1))}</li>"
+        else:
+            yield from close_list()
+            paragraph.append(_inline(line.strip()))
+
+    yield from close_paragraph()
+    yield from close_list()
+    if in_code:
+        yield "</code></pre>"
+
+
+def markdown_to_html(text: str) -> str:
+    """Summaries that are already HTML pass through; markdown is converted"""
+    stripped = text.strip()
+    if stripped.startswith("```html"):
+        stripped = stripped[len("```html"):].rsplit("```", 1)[0].strip()
+        return stripped
+    if _HTML_BLOCK.search(stripped):
+        return stripped
+    return "\n".join(iter_markdown_html(stripped.splitlines()))
+
+
+class DigestTemplate:
+    """Digest renderer: static shell compiled once, one cached fragment per topic card"""
+    def __init__(self, max_cards: int = 4096):
+        self._cards = LRUCache(max_cards)
+
+    def render_card(self, topic: str, summary: str) -> str:
+        key = (topic, summary)
+        card = self._cards.get(key)
+        if card is None:
+            card = CARD.format(topic=html.escape(topic), body=markdown_to_html(summary))
+            self._cards.set(key, card)
+        return card
+
+    def render(self, summaries: Dict[str, str], date: str, article_count) -> str:
+        parts = [HEAD, HEADER.format(date=html.escape(str(date)), article_count=html.escape(str(article_count)))]
+        parts.extend(self.render_card(topic, summary) for topic, summary in summaries.items())
+        parts.append(FOOTER)
+        return "".join(parts)
+
+
+digest_template = DigestTemplate()
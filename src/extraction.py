@@ -0,0 +1,116 @@
+# src/extraction.py
+import asyncio
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from trafilatura import extract
+
+logger = logging.getLogger(__name__)
+
+
+def extract_text(html: str) -> str:
+    """Extract the main article text from a page (CPU-bound, runs in a worker process)"""
+    # Use trafilatura for better content extraction
+    text = extract(html, include_comments=False,
+                  include_tables=False, output_format='text')
+
+    if not text or len(text) < 100:
+        # Fallback to basic extraction
+        from bs4 import BeautifulSoup
+        soup = BeautifulSoup(html, 'html.parser')
+
+        # Remove unwanted elements
+        for element in soup(['script', 'style', 'nav', 'footer', 'aside']):
+            element.decompose()
+
+        # Try to find main content
+        article = soup.find('article') or soup.find('main') or soup.body
+        text = article.get_text(separator='\n', strip=True) if article else ""
+
+    return text
+
+
+class ExtractionPool:
+    """Runs extract_text on a process pool so parsing never stalls the event loop.
+
+    At most `max_queue` documents are admitted at once (submitted or waiting
+    for a worker); further callers wait for a slot. Pages larger than
+    `max_bytes` (UTF-8) are cut before parsing. A document still running
+    after `timeout` seconds is killed with its pool, so a pathological page
+    can't keep a worker busy after its slot has been given back; the other
+    documents that were on that pool are resubmitted once to a fresh one.
+    """
+    def __init__(self, max_workers: int = None, max_queue: int = None,
+                 timeout: float = 15, max_bytes: int = 2_000_000):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_queue = max_queue or self.max_workers * 4
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self._executor = None
+        self._slots = asyncio.Semaphore(self.max_queue)
+        # Submitted only once a worker is free, so `timeout` times the parse, not the queue
+        self._running = asyncio.Semaphore(self.max_workers)
+
+    @classmethod
+    def from_env(cls) -> "ExtractionPool":
+        workers = os.getenv("EXTRACTION_WORKERS")
+        queue = os.getenv("EXTRACTION_QUEUE")
+        return cls(
+            max_workers=int(workers) if workers else None,
+            max_queue=int(queue) if queue else None,
+            timeout=float(os.getenv("EXTRACTION_TIMEOUT", 15)),
+            max_bytes=int(os.getenv("EXTRACTION_MAX_BYTES", 2_000_000)),
+        )
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._executor
+
+    async def extract(self, html: str) -> str:
+        if not html:
+            return ""
+        data = html.encode("utf-8")
+        if len(data) > self.max_bytes:
+            logger.warning(f"Truncating {len(data)} byte document to {self.max_bytes} before parsing")
+            html = data[:self.max_bytes].decode("utf-8", errors="ignore")
+        async with self._slots, self._running:
+            loop = asyncio.get_running_loop()
+            for attempt in range(2):
+                executor = self.executor
+                future = loop.run_in_executor(executor, extract_text, html)
+                try:
+                    return await asyncio.wait_for(future, self.timeout)
+                except asyncio.TimeoutError:
+                    # The worker is still parsing; only killing it frees the process
+                    logger.error(f"Extraction timed out after {self.timeout}s, restarting pool")
+                    self._recycle(executor)
+                    return ""
+                except BrokenProcessPool:
+                    # Another document's timeout recycled the pool, or a worker died
+                    # (e.g. OOM on a pathological page); either way try a fresh pool once
+                    logger.warning(f"Extraction pool broke (attempt {attempt + 1}), restarting it")
+                    self._recycle(executor)
+            return ""
+
+    def _recycle(self, executor: ProcessPoolExecutor):
+        """Kill `executor`'s workers; the next extract() starts a fresh pool.
+
+        Documents still queued or running on the old pool fail with
+        BrokenProcessPool, which extract() retries on the new pool.
+        """
+        if self._executor is executor:
+            self._executor = None
+        # ProcessPoolExecutor has no public way to stop a running task. Futures
+        # are left to fail as broken, not cancelled, so their callers can retry
+        for process in list((getattr(executor, "_processes", None) or {}).values()):
+            if process.is_alive():
+                process.terminate()
+        executor.shutdown(wait=False)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
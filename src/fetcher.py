@@ -2,61 +2,174 @@
 import asyncio
 import aiohttp
 import feedparser
-from trafilatura import extract
-from typing import List, Dict
+from extraction import ExtractionPool, extract_text
+from tracing import tracer
+from typing import List, Dict, Optional, Tuple
 import logging
+import os
+from datetime import datetime
+from urllib.parse import urlsplit
 
 logger = logging.getLogger(__name__)
 
+RSS_MAX_ENTRIES = int(os.getenv("RSS_MAX_ENTRIES", 10))  # per feed per poll
+
 class ContentFetcher:
-    def __init__(self, max_concurrent=5):
+    CACHED_CHARS = 20000  # cache more than any caller reads so one entry serves all
+    
+    def __init__(self, max_concurrent=5, limit_per_host=4, max_connections=100,
+                 dns_cache_ttl=300, keepalive_timeout=30, timeout=10, cache=None, db=None, extractor=None):
         self.max_concurrent = max_concurrent
+        self.cache = cache  # optional ArticleCache
+        self.db = db  # optional Database for feed validators and seen entries
+        self.extractor = extractor  # optional ExtractionPool, else a worker thread
+        self.limit_per_host = limit_per_host
+        self.max_connections = max_connections
+        self.dns_cache_ttl = dns_cache_ttl
+        self.keepalive_timeout = keepalive_timeout
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self._session = None
+    
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """Long-lived pooled session, created on first use inside the event loop"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.max_connections,
+                limit_per_host=self.limit_per_host,
+                use_dns_cache=True,
+                ttl_dns_cache=self.dns_cache_ttl,
+                keepalive_timeout=self.keepalive_timeout,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers={'User-Agent': 'Mozilla/5.0'}
+            )
+        return self._session
+    
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        if self.extractor is not None:
+            self.extractor.shutdown()
+    
+    async def __aenter__(self):
+        return self
     
-    async def fetch_rss_feed(self, feed_url: str) -> List[Dict]:
-        """Parse RSS feed asynchronously"""
-        loop = asyncio.get_event_loop()
-        feed = await loop.run_in_executor(None, feedparser.parse, feed_url)
+    async def __aexit__(self, *exc):
+        await self.close()
+    
+    async def fetch_conditional(self, url: str, etag: str = None, last_modified: str = None,
+                                binary: bool = False):
+        """GET with If-None-Match / If-Modified-Since validators.
+        
+        Returns (status, body, etag, last_modified); body is None on a 304.
+        """
+        headers = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        async with self._semaphore:
+            with tracer.span("fetch", host=urlsplit(url).hostname, conditional=bool(headers)) as span:
+                async with self.session.get(url, headers=headers) as response:
+                    span.set(status=response.status)
+                    if response.status == 304:
+                        return 304, None, etag, last_modified
+                    body = await (response.read() if binary else response.text())
+                    size = response.content.total_bytes  # body bytes, before text decoding
+                    span.set(bytes=size)
+                    tracer.count("fetch_bytes", size)
+                    return (response.status, body,
+                            response.headers.get('ETag'), response.headers.get('Last-Modified'))
+    
+    @tracer.traced("fetch_rss_feed")
+    async def fetch_rss_feed(self, feed_url: str, max_entries: int = None) -> Tuple[List[Dict], Optional[tuple]]:
+        """Parse RSS feed asynchronously, skipping unchanged feeds and known entries.
+        
+        Returns (articles, validators). The caller passes the (etag, last_modified)
+        validators to db.record_source_fetch only once the articles are stored:
+        recorded earlier, a crash would turn the next poll into a 304 and lose them.
+        """
+        max_entries = max_entries or RSS_MAX_ENTRIES
+        etag, last_modified = self.db.get_source_validators(feed_url) if self.db else (None, None)
+        status, body, etag, last_modified = await self.fetch_conditional(
+            feed_url, etag, last_modified, binary=True)
+        
+        if status == 304:
+            # Unchanged since the last poll: nothing to download or parse
+            if self.db:
+                self.db.record_source_fetch(feed_url)
+            return [], None
+        if status >= 400:
+            logger.error(f"Feed {feed_url} returned HTTP {status}")
+            return [], None
+        
+        feed = await asyncio.to_thread(feedparser.parse, body)
         
         articles = []
-        for entry in feed.entries[:10]:  # Limit to 10 per feed
+        for entry in feed.entries[:max_entries]:
+            if not entry.get('link'):
+                continue
+            published = entry.get('published_parsed')
             article = {
                 'id': entry.get('id', entry.link),
                 'title': entry.get('title', ''),
                 'link': entry.link,
                 'summary': entry.get('summary', ''),
-                'published': entry.get('published_parsed'),
+                'published': datetime(*published[:6]) if published else None,
                 'source_name': feed.feed.get('title', 'Unknown')
             }
             articles.append(article)
-        return articles
+        
+        if self.db:
+            known = self.db.articles_exist_many([a['id'] for a in articles])
+            articles = [a for a in articles if a['id'] not in known]
+        return articles, (etag, last_modified)
     
-    async def fetch_full_content(self, url: str) -> str:
+    @tracer.traced("fetch_full_content")
+    async def fetch_full_content(self, url: str, max_chars: int = 5000) -> str:
         """Fetch and extract main content from URL"""
+        stale = None
+        if self.cache is not None:
+            cached = self.cache.get(url)
+            if cached is not None:
+                return cached[:max_chars]
+            stale = self.cache.validators(url)
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, timeout=10, 
-                                     headers={'User-Agent': 'Mozilla/5.0'}) as response:
-                    html = await response.text()
-            
-            # Use trafilatura for better content extraction
-            text = extract(html, include_comments=False, 
-                          include_tables=False, output_format='text')
+            etag, last_modified = (stale[1], stale[2]) if stale else (None, None)
+            status, html, etag, last_modified = await self.fetch_conditional(url, etag, last_modified)
+            if status == 304 and stale:
+                self.cache.touch(url, stale[0])
+                return stale[0][:max_chars]
             
-            if not text or len(text) < 100:
-                # Fallback to basic extraction
-                from bs4 import BeautifulSoup
-                soup = BeautifulSoup(html, 'html.parser')
-                
-                # Remove unwanted elements
-                for element in soup(['script', 'style', 'nav', 'footer', 'aside']):
-                    element.decompose()
-                
-                # Try to find main content
-                article = soup.find('article') or soup.find('main') or soup.body
-                text = article.get_text(separator='\n', strip=True)
-            
-            return text[:5000]  # Limit length for token management
+            # Extraction is CPU-bound, keep it off the event loop
+            with tracer.span("extract", chars=len(html or "")):
+                if self.extractor is not None:
+                    text = await self.extractor.extract(html)
+                else:
+                    text = await asyncio.to_thread(extract_text, html)
+            if self.cache is not None and status < 400:
+                # Off the loop too: storing also fingerprints the text
+                await asyncio.to_thread(self.cache.set, url, text[:self.CACHED_CHARS], etag, last_modified)
+            return text[:max_chars]  # Limit length for token management
             
         except Exception as e:
             logger.error(f"Failed to fetch {url}: {e}")
             return ""
+    
+    async def fetch_many(self, urls: List[str], max_chars: int = 5000) -> Dict[str, str]:
+        """Fetch and extract a batch of URLs over the shared pool"""
+        urls = list(dict.fromkeys(urls))
+        texts = await asyncio.gather(*[self.fetch_full_content(u, max_chars) for u in urls])
+        return dict(zip(urls, texts))
+
+
+# Process-wide fetcher so the agent tools share one connection pool
+shared_fetcher = ContentFetcher(
+    max_concurrent=int(os.getenv("FETCH_CONCURRENCY", 10)),
+    extractor=ExtractionPool.from_env()
+)
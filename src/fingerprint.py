@@ -0,0 +1,108 @@
+# src/fingerprint.py
+import hashlib
+import re
+from collections import Counter
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple
+
+_WORD = re.compile(r"\w+")
+_LINK_LINE = re.compile(r"^(Link|URL|Source):.*$|https?://\S+", re.MULTILINE)
+
+BITS = 64
+# Syndicated copies of a story land within a few bits of each other; unrelated
+# texts average 32 but short ones spread less, so stay well clear of them
+NEAR_DUPLICATE_BITS = 6
+# Below this many distinct words a SimHash is too coarse to cluster on
+MIN_WORDS = 8
+
+
+def _feature_hash(feature: str) -> int:
+    return int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def simhash(text: str) -> Optional[int]:
+    """64-bit SimHash of a text's words; similar texts get hashes a small Hamming distance apart.
+
+    URLs are left out, since they differ between copies of the same story.
+    Texts with fewer than MIN_WORDS distinct words get None: a few words
+    put unrelated headlines within NEAR_DUPLICATE_BITS of each other.
+    """
+    words = Counter(_WORD.findall(_LINK_LINE.sub(" ", text or "").lower()))
+    if len(words) < MIN_WORDS:
+        return None
+    weights = [0] * BITS
+    for word, count in words.items():
+        h = _feature_hash(word)
+        for bit in range(BITS):
+            weights[bit] += count if h >> bit & 1 else -count
+    return sum(1 << bit for bit in range(BITS) if weights[bit] > 0)
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def to_sqlite(fingerprint: Optional[int]) -> Optional[int]:
+    """Fold an unsigned 64-bit fingerprint into SQLite's signed INTEGER range"""
+    if fingerprint is None:
+        return None
+    return fingerprint - (1 << BITS) if fingerprint >= 1 << (BITS - 1) else fingerprint
+
+
+def from_sqlite(value: Optional[int]) -> Optional[int]:
+    if value is None:
+        return None
+    return value + (1 << BITS) if value < 0 else value
+
+
+class SimHashIndex:
+    """LSH index over SimHash fingerprints.
+
+    Each fingerprint is split into max_distance + 1 bands; two fingerprints
+    within max_distance bits must agree on at least one whole band, so only
+    keys sharing a band are compared instead of every pair.
+    """
+    def __init__(self, max_distance: int = NEAR_DUPLICATE_BITS):
+        self.max_distance = max_distance
+        bands = max_distance + 1
+        self._bands, start = [], 0
+        for i in range(bands):
+            width = BITS // bands + (i < BITS % bands)
+            self._bands.append((start, width))
+            start += width
+        self._buckets: Dict[Tuple[int, int], List[Hashable]] = {}
+        self._fingerprints: Dict[Hashable, int] = {}
+
+    def _keys(self, fingerprint: int):
+        for i, (start, width) in enumerate(self._bands):
+            yield i, fingerprint >> start & ((1 << width) - 1)
+
+    def add(self, key: Hashable, fingerprint: int):
+        self._fingerprints[key] = fingerprint
+        for band in self._keys(fingerprint):
+            self._buckets.setdefault(band, []).append(key)
+
+    def near(self, fingerprint: int) -> List[Hashable]:
+        """Keys whose fingerprints are within max_distance bits"""
+        found = {}
+        for band in self._keys(fingerprint):
+            for key in self._buckets.get(band, ()):
+                if key not in found and hamming(fingerprint, self._fingerprints[key]) <= self.max_distance:
+                    found[key] = True
+        return list(found)
+
+    def __len__(self):
+        return len(self._fingerprints)
+
+
+def representatives(items: Iterable[Tuple[Hashable, int]],
+                    max_distance: int = NEAR_DUPLICATE_BITS) -> List[Hashable]:
+    """First key of each near-duplicate cluster, in input order (None fingerprints are always kept)"""
+    index = SimHashIndex(max_distance)
+    kept = []
+    for key, fingerprint in items:
+        if fingerprint is not None and index.near(fingerprint):
+            continue
+        if fingerprint is not None:
+            index.add(key, fingerprint)
+        kept.append(key)
+    return kept
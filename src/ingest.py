@@ -0,0 +1,162 @@
+# src/ingest.py
+import argparse
+import asyncio
+import logging
+import os
+from typing import AsyncIterator, Awaitable, Callable, Dict, List
+
+from db import Database
+from fetcher import ContentFetcher, shared_fetcher
+from cache import ArticleCache
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+FEED_WORKERS = int(os.getenv("INGEST_FEED_WORKERS", 8))
+TEXT_WORKERS = int(os.getenv("INGEST_TEXT_WORKERS", 16))
+QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", 100))
+INSERT_BATCH = int(os.getenv("INGEST_INSERT_BATCH", 200))
+
+_DONE = object()
+
+
+async def _aiter(items) -> AsyncIterator:
+    for item in items:
+        yield item
+
+
+async def stage(source: AsyncIterator, worker: Callable[[object], Awaitable[object]],
+                concurrency: int, maxsize: int = QUEUE_SIZE) -> AsyncIterator:
+    """Run `worker` over an async stream with `concurrency` tasks, yielding results as they finish.
+
+    Both sides of the stage are bounded queues, so a slow downstream stage
+    backs up into this one instead of buffering the whole corpus in memory.
+    Items whose worker raises are logged and dropped.
+    """
+    inbox: asyncio.Queue = asyncio.Queue(maxsize)
+    outbox: asyncio.Queue = asyncio.Queue(maxsize)
+
+    async def feed():
+        async for item in source:
+            await inbox.put(item)
+        for _ in range(concurrency):
+            await inbox.put(_DONE)
+
+    async def work():
+        while True:
+            item = await inbox.get()
+            if item is _DONE:
+                await outbox.put(_DONE)
+                return
+            try:
+                await outbox.put(await worker(item))
+            except Exception as e:
+                logger.error(f"Ingest stage failed on {item!r}: {e}")
+
+    tasks = [asyncio.create_task(feed())] + [asyncio.create_task(work()) for _ in range(concurrency)]
+    try:
+        finished = 0
+        while finished < concurrency:
+            result = await outbox.get()
+            if result is _DONE:
+                finished += 1
+                continue
+            yield result
+        await tasks[0]  # surface errors from the producer
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def flatten(source: AsyncIterator) -> AsyncIterator:
+    async for items in source:
+        for item in items:
+            yield item
+
+
+async def batched(source: AsyncIterator, size: int) -> AsyncIterator[List]:
+    batch = []
+    async for item in source:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def ingest(db: Database, fetcher: ContentFetcher, max_entries: int = None,
+                 with_full_text: bool = True) -> Dict[str, int]:
+    """Poll every active source and store new entries, tagged with the source's topic.
+
+    sources -> feed fetch (conditional GET, known entries filtered)
+            -> full-text fetch -> batched insert into `articles`
+    """
+    sources = db.get_active_sources()
+    logger.info(f"Ingesting {len(sources)} active sources")
+    stats = {"sources": len(sources), "articles": 0, "inserted": 0}
+
+    # Feed validators are saved once all of the feed's new entries are stored,
+    # so an interrupted run re-downloads the feed instead of getting a 304
+    pending: Dict[str, list] = {}  # feed url -> [entries not yet stored, etag, last_modified]
+
+    async def fetch_feed(source):
+        url, name, topic = source
+        articles, validators = await fetcher.fetch_rss_feed(url, max_entries=max_entries)
+        for article in articles:
+            article['topic'] = topic
+            article['feed_url'] = url
+            if article.get('source_name') in (None, 'Unknown') and name:
+                article['source_name'] = name
+        if validators is not None:
+            if articles:
+                pending[url] = [len(articles), *validators]
+            else:
+                await db.run(db.record_source_fetch, url, *validators)
+        return articles
+
+    async def fetch_text(article):
+        article['full_text'] = await fetcher.fetch_full_content(article['link']) or None
+        return article
+
+    articles = flatten(stage(_aiter(sources), fetch_feed, FEED_WORKERS))
+    if with_full_text:
+        articles = stage(articles, fetch_text, TEXT_WORKERS)
+
+    async for batch in batched(articles, INSERT_BATCH):
+        stats["articles"] += len(batch)
+        stats["inserted"] += await db.run(db.insert_articles_many, batch)
+        for article in batch:
+            entry = pending.get(article['feed_url'])
+            if entry is not None:
+                entry[0] -= 1
+                if entry[0] == 0:
+                    del pending[article['feed_url']]
+                    await db.run(db.record_source_fetch, article['feed_url'], entry[1], entry[2])
+
+    logger.info(f"Ingest done: {stats}")
+    return stats
+
+
+async def main(args):
+    db = Database()
+    shared_fetcher.db = db
+    shared_fetcher.cache = ArticleCache(db)
+    if args.add_source:
+        db.upsert_source(args.add_source, name=args.name, topic=args.topic)
+        logger.info(f"Added source {args.add_source}")
+        return
+    try:
+        await ingest(db, shared_fetcher, max_entries=args.max_entries, with_full_text=not args.no_full_text)
+    finally:
+        await shared_fetcher.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Poll RSS sources into the articles table")
+    parser.add_argument("--max-entries", type=int, help="entries to take per feed (default RSS_MAX_ENTRIES)")
+    parser.add_argument("--no-full-text", action="store_true", help="store feed summaries only")
+    parser.add_argument("--add-source", metavar="URL", help="register a feed instead of ingesting")
+    parser.add_argument("--name", help="display name for --add-source")
+    parser.add_argument("--topic", help="topic for --add-source")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,172 @@
+# src/jobs.py
+import logging
+import os
+import socket
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Job states
+PENDING = "pending"
+RESEARCHING = "researching"
+SUMMARIZED = "summarized"
+SENT = "sent"
+FAILED = "failed"
+
+# Job kinds
+RESEARCH = "research"
+SEND = "send"
+
+
+def worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class Job:
+    __slots__ = ("id", "kind", "key", "payload", "attempts")
+
+    def __init__(self, id, kind, key, payload, attempts):
+        self.id = id
+        self.kind = kind
+        self.key = key
+        self.payload = payload
+        self.attempts = attempts
+
+
+class JobQueue:
+    """SQLite-backed queue of research and send jobs for one nightly run.
+
+    Research jobs (one per normalized topic) go pending -> researching ->
+    summarized; send jobs (one per recipient) go pending -> sent. Jobs are
+    unique per (run_date, kind, key), so re-enqueueing after a crash keeps the
+    work that already finished. A worker leases jobs for `lease_seconds`; if
+    it dies the lease expires and another worker picks the job up. Failures
+    are retried with exponential backoff until `max_attempts`, then marked
+    failed. Sends are at-least-once: a worker that dies between handing a
+    batch to Mailjet and marking it sent leaves it to be sent again.
+    """
+    def __init__(self, db, owner: str = None, lease_seconds: int = 900,
+                 max_attempts: int = 3, backoff_seconds: float = 30):
+        self.db = db
+        self.owner = owner or worker_id()
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+
+    def enqueue(self, run_date: str, kind: str, items: Dict[str, str]):
+        """Add {key: payload} jobs.
+
+        Keys that already have a job this run are left alone, except failed
+        ones: re-running the scheduler gives those a fresh set of attempts.
+        """
+        now = datetime.now()
+        with self.db.transaction() as cursor:
+            cursor.executemany('''
+                INSERT INTO jobs (run_date, kind, key, payload, state, attempts, updated_at)
+                VALUES (?, ?, ?, ?, ?, 0, ?)
+                ON CONFLICT(run_date, kind, key) DO UPDATE SET
+                    payload = excluded.payload, state = excluded.state, attempts = 0,
+                    error = NULL, next_attempt_at = NULL, updated_at = excluded.updated_at
+                WHERE jobs.state = ?
+            ''', [(run_date, kind, key, payload, PENDING, now, FAILED) for key, payload in items.items()])
+
+    def lease(self, run_date: str, kind: str, limit: int) -> List[Job]:
+        """Claim up to `limit` runnable jobs.
+
+        Runnable means pending and past its retry time, or held under a lease
+        that has expired. Each claim is a compare-and-set on the row, so
+        concurrent workers (even in other processes) never get the same job.
+        """
+        now = datetime.now()
+        sql = '''
+            SELECT id, kind, key, payload, attempts FROM jobs
+            WHERE run_date = ? AND kind = ?
+              AND ((state = ? AND (next_attempt_at IS NULL OR next_attempt_at <= ?)
+                    AND (lease_expires IS NULL OR lease_expires < ?))
+                   OR (state = ? AND lease_expires < ?))
+        '''
+        params = [run_date, kind, PENDING, now, now, RESEARCHING, now]
+        sql += " ORDER BY id LIMIT ?"
+        params.append(limit)
+
+        claimed = []
+        lease_until = now + timedelta(seconds=self.lease_seconds)
+        leased_state = RESEARCHING if kind == RESEARCH else PENDING
+        with self.db.transaction() as cursor:
+            candidates = cursor.execute(sql, params).fetchall()
+            for row in candidates:
+                cursor.execute('''
+                    UPDATE jobs SET state = ?, lease_owner = ?, lease_expires = ?, updated_at = ?
+                    WHERE id = ? AND state IN (?, ?) AND (lease_expires IS NULL OR lease_expires < ?)
+                ''', (leased_state, self.owner, lease_until, now, row[0], PENDING, RESEARCHING, now))
+                if cursor.rowcount == 1:
+                    claimed.append(Job(*row))
+        return claimed
+
+    def complete(self, jobs: Iterable[Job], state: str, results: Dict[int, str] = None):
+        """Mark leased jobs done (summarized / sent), optionally storing a result per job id"""
+        now = datetime.now()
+        results = results or {}
+        with self.db.transaction() as cursor:
+            cursor.executemany('''
+                UPDATE jobs SET state = ?, result = COALESCE(?, result), error = NULL,
+                    lease_owner = NULL, lease_expires = NULL, updated_at = ?
+                WHERE id = ?
+            ''', [(state, results.get(job.id), now, job.id) for job in jobs])
+
+    def fail(self, job: Job, error: str):
+        """Release a job for a later retry, or give up after max_attempts"""
+        now = datetime.now()
+        attempts = job.attempts + 1
+        if attempts >= self.max_attempts:
+            state, next_attempt = FAILED, None
+            logger.error(f"{job.kind} job {job.key!r} failed permanently: {error}")
+        else:
+            state = PENDING
+            next_attempt = now + timedelta(seconds=self.backoff_seconds * 2 ** (attempts - 1))
+            logger.warning(f"{job.kind} job {job.key!r} failed (attempt {attempts}), retrying at {next_attempt}: {error}")
+        with self.db.transaction() as cursor:
+            cursor.execute('''
+                UPDATE jobs SET state = ?, attempts = ?, error = ?, next_attempt_at = ?,
+                    lease_owner = NULL, lease_expires = NULL, updated_at = ?
+                WHERE id = ?
+            ''', (state, attempts, str(error)[:2000], next_attempt, now, job.id))
+
+    def next_wakeup(self, run_date: str, kind: str) -> Optional[float]:
+        """Seconds until some outstanding job may become runnable; None when nothing is left"""
+        sql = '''
+            SELECT state, next_attempt_at, lease_expires FROM jobs
+            WHERE run_date = ? AND kind = ? AND (state = ? OR (state = ? AND lease_expires IS NOT NULL))
+        '''
+        rows = self.db.conn.execute(sql, (run_date, kind, PENDING, RESEARCHING)).fetchall()
+        if not rows:
+            return None
+        now = datetime.now()
+        waits = []
+        for state, next_attempt_at, lease_expires in rows:
+            at = lease_expires if lease_expires else next_attempt_at
+            if at is None:
+                return 0.0
+            waits.append((datetime.fromisoformat(str(at)) - now).total_seconds())
+        return max(0.0, min(waits))
+
+    def results(self, run_date: str, kind: str) -> Dict[str, str]:
+        """Stored results of finished jobs; permanently failed ones map to an error note"""
+        rows = self.db.conn.execute(
+            "SELECT key, state, result, error FROM jobs WHERE run_date = ? AND kind = ? AND state IN (?, ?, ?)",
+            (run_date, kind, SUMMARIZED, SENT, FAILED)
+        ).fetchall()
+        return {
+            key: result if state != FAILED else f"## Error\nAgent failed: {error}"
+            for key, state, result, error in rows
+        }
+
+    def progress(self, run_date: str) -> Dict[str, Dict[str, int]]:
+        """{kind: {state: count}} for a run"""
+        progress: Dict[str, Dict[str, int]] = {}
+        for kind, state, count in self.db.conn.execute(
+            "SELECT kind, state, COUNT(*) FROM jobs WHERE run_date = ? GROUP BY kind, state", (run_date,)
+        ):
+            progress.setdefault(kind, {})[state] = count
+        return progress
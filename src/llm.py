@@ -0,0 +1,113 @@
+# src/llm.py
+import hashlib
+import logging
+import os
+from functools import lru_cache
+from typing import List, Optional
+
+from cache import LRUCache
+from concurrency import limits
+from costs import cost_tracker, token_usage
+from topic_index import normalize_topic
+from tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "gemini-3-pro-preview"
+# Used instead of DEFAULT_MODEL once the daily budget runs tight
+CHEAP_MODEL = os.getenv("CHEAP_MODEL", "gemini-2.5-flash")
+
+
+@lru_cache(maxsize=None)
+def get_chat_model(model: str = DEFAULT_MODEL):
+    """One Gemini client per model name, reused across calls"""
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    return ChatGoogleGenerativeAI(model=model, api_key=os.getenv("GOOGLE_API_KEY"))
+
+
+def cache_key(model: str, messages: List, topic: str = "") -> str:
+    """Hash of model, normalized topic and the full prompt"""
+    h = hashlib.sha256()
+    h.update(model.encode("utf-8"))
+    h.update(b"\0")
+    h.update(normalize_topic(topic).encode("utf-8"))
+    for message in messages:
+        h.update(b"\0")
+        h.update(getattr(message, "type", "").encode("utf-8"))
+        h.update(b"\0")
+        h.update(str(message.content).encode("utf-8"))
+    return h.hexdigest()
+
+
+class LLMCache:
+    """Response cache for LLM calls: in-memory LRU in front of an optional SQLite store.
+
+    The store is anything with the Database `get_llm_response` /
+    `save_llm_response` / `evict_llm_responses` methods; without one the cache
+    is process-local.
+    """
+    def __init__(self, db=None, ttl_hours: float = None, memory_size: int = 1024,
+                 max_entries: int = None, evict_every: int = 100):
+        self.db = db
+        self.ttl_hours = ttl_hours if ttl_hours is not None else float(os.getenv("LLM_CACHE_TTL_HOURS", 24))
+        self.max_entries = max_entries if max_entries is not None else int(os.getenv("LLM_CACHE_MAX_ENTRIES", 10000))
+        self.memory = LRUCache(memory_size, ttl=self.ttl_hours * 3600)
+        self.evict_every = evict_every
+        self._writes = 0
+
+    def get(self, key: str, ttl_hours: float = None) -> Optional[str]:
+        ttl_hours = ttl_hours if ttl_hours is not None else self.ttl_hours
+        value = self.memory.get(key, max_age=ttl_hours * 3600)
+        if value is not None:
+            tracer.count("cache_requests", cache="llm", result="memory_hit")
+            return value
+        if self.db is not None:
+            value = self.db.get_llm_response(key, max_age_hours=ttl_hours)
+        if value is not None:
+            self.memory.set(key, value)
+        tracer.count("cache_requests", cache="llm", result="db_hit" if value is not None else "miss")
+        return value
+
+    def set(self, key: str, value: str, model: str = None, topic: str = None, kind: str = None):
+        self.memory.set(key, value)
+        if self.db is None:
+            return
+        self.db.save_llm_response(key, value, model, normalize_topic(topic or ""), kind)
+        self._writes += 1
+        if self._writes % self.evict_every == 0:
+            self.db.evict_llm_responses(self.max_entries)
+
+    def latest(self, topic: str, kind: str) -> Optional[str]:
+        """Last stored response of a kind for a topic, ignoring the TTL (budget fallback)"""
+        if self.db is None:
+            return None
+        return self.db.latest_llm_response(normalize_topic(topic), kind)
+
+
+async def cached_ainvoke(messages: List, topic: str = "", model: str = DEFAULT_MODEL,
+                         ttl_hours: float = None, cache: "LLMCache" = None, kind: str = None) -> str:
+    """`ainvoke` through the response cache; returns the response text.
+    
+    Misses go through the "gemini" provider limit (rate, circuit breaker) and
+    are charged to the cost tracker; hits skip both.
+    """
+    cache = cache or response_cache
+    key = cache_key(model, messages, topic)
+    with tracer.span("llm", model=model, kind=kind) as span:
+        cached = cache.get(key, ttl_hours)
+        if cached is not None:
+            logger.debug(f"LLM cache hit for {topic!r} ({model})")
+            span.set(cached=True)
+            return cached
+        async with limits.provider("gemini"):
+            response = await get_chat_model(model).ainvoke(messages)
+        tokens_in, tokens_out = token_usage(response)
+        span.set(cached=False, tokens_in=tokens_in, tokens_out=tokens_out)
+        cost_tracker.record("gemini", model, normalize_topic(topic), tokens_in, tokens_out)
+        text = response.text
+        cache.set(key, text, model=model, topic=topic, kind=kind)
+        return text
+
+
+# Process-wide cache; entry points attach their Database to make it persistent
+response_cache = LLMCache()
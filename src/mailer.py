@@ -1,72 +1,37 @@
 from mailjet_rest import Client
+from typing import Dict, List
+import asyncio
+import logging
 import os
 
+from concurrency import limits
+from resilience import retry_after
+from tracing import tracer
+from digest_template import digest_template
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 50  # Mailjet v3.1 accepts at most 50 messages per request
+
+def _report(call, result):
+    """Tell the mailjet rate limit and breaker about a 429 or 5xx response"""
+    if result.status_code == 429:
+        call.throttled(retry_after(result.headers))
+    elif result.status_code >= 500:
+        call.failed(f"HTTP {result.status_code}")
+
 class EmailSender:
     def __init__(self, config=None):
         api_key = os.getenv('MAILJET_API_KEY')
         api_secret = os.getenv('MAILJET_SECRET_KEY')
         self.sender_email = os.getenv('SENDER_EMAIL') # Functioning as 'From' address
-        self.client = Client(auth=(api_key, api_secret), version='v3.1')
+        # MAILJET_API_URL points the client elsewhere, e.g. at the benchmark's fake
+        self.client = Client(auth=(api_key, api_secret), version='v3.1',
+                             api_url=os.getenv('MAILJET_API_URL', 'https://api.mailjet.com/'))
 
     def render_template(self, summaries, date, article_count):
-        # Modern HTML Email Template
-        html = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <meta charset="utf-8">
-            <meta name="viewport" content="width=device-width, initial-scale=1.0">
-            <style>
-                body {{ font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, Helvetica, Arial, sans-serif; line-height: 1.6; color: #374151; background-color: #f3f4f6; margin: 0; padding: 0; }}
-                .container {{ max-width: 600px; margin: 0 auto; background-color: #ffffff; }}
-                .header {{ background-color: #2563eb; color: #ffffff; padding: 30px 20px; text-align: center; }}
-                .header h1 {{ margin: 0; font-size: 24px; font-weight: 700; }}
-                .meta {{ font-size: 14px; opacity: 0.9; margin-top: 10px; }}
-                .content {{ padding: 30px 20px; }}
-                .topic-card {{ margin-bottom: 30px; border-bottom: 1px solid #e5e7eb; padding-bottom: 30px; }}
-                .topic-card:last-child {{ border-bottom: none; }}
-                .topic-header {{ color: #111827; font-size: 20px; font-weight: 600; margin-bottom: 15px; text-transform: capitalize; border-left: 4px solid #2563eb; padding-left: 12px; }}
-                .summary-content {{ font-size: 16px; color: #4b5563; }}
-                .footer {{ background-color: #f9fafb; padding: 20px; text-align: center; font-size: 12px; color: #9ca3af; border-top: 1px solid #e5e7eb; }}
-                a {{ color: #2563eb; text-decoration: none; }}
-                strong {{ color: #1f2937; }}
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <div class="header">
-                    <h1>Daily Intelligence Briefing</h1>
-                    <div class="meta">{date} &bull; {article_count} Topics Analyzed</div>
-                </div>
-                <div class="content">
-        """
-        
-        for topic, summary in summaries.items():
-            # Convert markdown-style headers if present
-            formatted_summary = summary.replace("## ", "")
-            # Basic markdown to HTML conversion for lists
-            formatted_summary = formatted_summary.replace("\n- ", "<br>&bull; ")
-            
-            html += f"""
-            <div class="topic-card">
-                <div class="topic-header">{topic}</div>
-                <div class="summary-content">
-                    {formatted_summary}
-                </div>
-            </div>
-            """
-        
-        html += """
-                </div>
-                <div class="footer">
-                    <p>Generated by News Agent AI. Sources verified.</p>
-                    <p>To unsubscribe, please reply to this email.</p>
-                </div>
-            </div>
-        </body>
-        </html>
-        """
-        return html
+        # Static shell is precompiled; topic cards are cached across recipients
+        return digest_template.render(summaries, date, article_count)
 
     def render_otp_template(self, otp):
         html = f"""
@@ -105,30 +70,85 @@ class EmailSender:
         """
         return html
 
-    async def send_email(self, subject, html_content, to_email=None):
+    def build_message(self, subject, html_content, to_email=None, text_part="Your daily news digest is here."):
         recipient = to_email if to_email else os.getenv("RECIPIENT_EMAIL")
-        data = {
-          'Messages': [
+        return {
+          "From": {
+            "Email": self.sender_email,
+            "Name": "News Agent"
+          },
+          "To": [
             {
-              "From": {
-                "Email": self.sender_email,
-                "Name": "News Agent"
-              },
-              "To": [
-                {
-                  "Email": recipient,
-                  "Name": "Subscriber"
-                }
-              ],
-              "Subject": subject,
-              "HTMLPart": html_content,
-              "TextPart": "Your daily news digest is here."
+              "Email": recipient,
+              "Name": "Subscriber"
             }
-          ]
+          ],
+          "Subject": subject,
+          "HTMLPart": html_content,
+          "TextPart": text_part,
+          "CustomID": recipient
+        }
+
+    @tracer.traced("mailer.send_email")
+    async def send_email(self, subject, html_content, to_email=None):
+        data = {
+          'Messages': [self.build_message(subject, html_content, to_email)]
         }
         
         try:
-            result = self.client.send.create(data=data)
+            async with limits.provider("mailjet") as call:
+                # mailjet_rest is synchronous; keep its round trip off the event loop
+                result = await asyncio.to_thread(self.client.send.create, data=data)
+                _report(call, result)
             print(f"Mailjet response: {result.status_code}")
+            return result.status_code == 200
+        except Exception as e:
+            print(f"Failed to send email via Mailjet: {e}")
+            return False
+
+    @tracer.traced("mailer.send_batch")
+    async def send_batch(self, messages: List[dict], chunk_size: int = BATCH_SIZE,
+                         retries: int = 2) -> Dict[str, str]:
+        """Send many messages through Mailjet's multi-message API.
+        
+        `messages` come from build_message. They go out in chunks of up to
+        `chunk_size` per request, concurrently under the Mailjet limit; entries
+        that fail are retried one at a time. Returns {recipient: "success" | "error"}.
+        """
+        chunks = [messages[i:i + chunk_size] for i in range(0, len(messages), chunk_size)]
+        results = await asyncio.gather(*[self._send_chunk(chunk) for chunk in chunks])
+        
+        statuses = {}
+        failed = []
+        for chunk, chunk_statuses in zip(chunks, results):
+            for message, status in zip(chunk, chunk_statuses):
+                statuses[message["CustomID"]] = status
+                if status != "success":
+                    failed.append(message)
+        
+        async def retry(message):
+            for attempt in range(retries):
+                await asyncio.sleep(2 ** attempt)
+                status = (await self._send_chunk([message]))[0]
+                statuses[message["CustomID"]] = status
+                if status == "success":
+                    return
+            logger.error(f"Giving up on {message['CustomID']} after {retries} retries")
+        
+        await asyncio.gather(*[retry(m) for m in failed])
+        return statuses
+
+    async def _send_chunk(self, messages: List[dict]) -> List[str]:
+        """One Mailjet request; per-message statuses in input order"""
+        try:
+            async with limits.provider("mailjet") as call:
+                result = await asyncio.to_thread(self.client.send.create, data={'Messages': messages})
+                _report(call, result)
+            body = result.json() or {}
+            entries = body.get("Messages") or []
+            if len(entries) == len(messages):
+                return [e.get("Status", "error") for e in entries]
+            logger.error(f"Mailjet batch failed with HTTP {result.status_code}: {body}")
         except Exception as e:
-            print(f"Failed to send email via Mailjet: {e}")
\ No newline at end of file
+            logger.error(f"Mailjet batch request failed: {e}")
+        return ["error"] * len(messages)
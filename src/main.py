@@ -7,15 +7,32 @@ from typing import Dict, List
 import yaml
 
 from mailer import EmailSender
+from concurrency import limits, run_bounded
+from fetcher import shared_fetcher
+from cache import ArticleCache
+from db import Database
+from llm import response_cache
+from costs import cost_tracker
+from tracing import tracer
 from agent.graph import app as search_graph
+from agent.tools import local_corpus
+from agent.memory import topic_memory
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class NewsAgent:
-    def __init__(self, config: Dict):
+    def __init__(self, config: Dict, db: Database = None):
         self.config = config
         self.mailer = EmailSender(config)
+        self.db = db or Database()
+        # Scraped article text is cached in the articles table across runs
+        shared_fetcher.cache = ArticleCache(self.db)
+        shared_fetcher.db = self.db
+        response_cache.db = self.db
+        cost_tracker.db = self.db
+        local_corpus.db = self.db
+        topic_memory.db = self.db
     
     async def run_daily_pipeline(self, topics: List[str] = None):
         """Execute the complete pipeline using LangGraph"""
@@ -31,10 +48,14 @@ class NewsAgent:
                 logger.error(f"Failed to load topics.yaml: {e}")
                 return
 
-        summaries = {}
-        
-        # 2. Run Graph for each topic
-        for topic in topics:
+        # 2. Run Graph for each topic, bounded by the shared limiter
+        results = await run_bounded(topics, self.research_topic, limits.global_limit)
+        return dict(zip(topics, results))
+    
+    @tracer.traced("research_topic")
+    async def research_topic(self, topic: str, raise_errors: bool = False) -> str:
+        """Run the research graph for a single topic and return its summary"""
+        async with limits.job():
             logger.info(f"Agent researching topic: {topic}")
             try:
                 # Invoke the graph
@@ -45,7 +66,6 @@ class NewsAgent:
                     "summary": ""
                 }
                 result = await search_graph.ainvoke(inputs)
-                summaries[topic] = result.get("summary", "No summary generated.")
                 
                 # Log sources
                 sources = result.get("sources", [])
@@ -55,25 +75,49 @@ class NewsAgent:
                         for s in sources:
                             f.write(f"- {s}\n")
                 
+                return result.get("summary", "No summary generated.")
             except Exception as e:
                 logger.error(f"Agent failed on topic {topic}: {e}")
-                summaries[topic] = f"## Error\nAgent failed: {str(e)}"
-        
-        return summaries
+                if raise_errors:
+                    raise
+                return f"## Error\nAgent failed: {str(e)}"
     
-    async def send_digest(self, summaries: Dict[str, str], article_count: int, to_email: str = None):
-        """Generate and send email digest"""
+    def build_digest(self, summaries: Dict[str, str], article_count: int, to_email: str = None) -> dict:
+        """Render a digest into a Mailjet message"""
         email_html = self.mailer.render_template(
             summaries=summaries,
             date=datetime.now().strftime("%B %d, %Y"),
             article_count=f"{article_count} Topics"
         )
-        
-        await self.mailer.send_email(
+        return self.mailer.build_message(
             subject=f"Your Daily Agent Briefing: {datetime.now().strftime('%Y-%m-%d')}",
             html_content=email_html,
             to_email=to_email
         )
+    
+    async def send_digest(self, summaries: Dict[str, str], article_count: int, to_email: str = None):
+        """Generate and send email digest"""
+        message = self.build_digest(summaries, article_count, to_email)
+        statuses = await self.mailer.send_batch([message])
+        return statuses.get(message["CustomID"]) == "success"
+    
+    async def send_digests(self, digests: Dict[str, Dict[str, str]]) -> Dict[str, str]:
+        """Send many users' digests in batched Mailjet requests; {email: status}"""
+        messages = [self.build_digest(d, len(d), to_email=email) for email, d in digests.items()]
+        return await self.mailer.send_batch(messages)
+    
+    async def close(self):
+        """Release the shared HTTP connection pool and flush metrics"""
+        await shared_fetcher.close()
+        rates = tracer.cache_hit_rates()
+        if rates:
+            logger.info("Cache hit rates: " + ", ".join(f"{name} {rate:.0%}" for name, rate in sorted(rates.items())))
+        # Batch runs have nothing to scrape, so leave a textfile for node_exporter
+        # ("{pid}" in the path keeps worker processes apart)
+        metrics_file = os.getenv("METRICS_FILE")
+        if metrics_file:
+            tracer.write_prometheus(metrics_file.format(pid=os.getpid()))
+        tracer.close()
 
 if __name__ == "__main__":
     from dotenv import load_dotenv
@@ -87,4 +131,11 @@ if __name__ == "__main__":
     }
     
     agent = NewsAgent(config)
-    asyncio.run(agent.run_daily_pipeline())
+    
+    async def run():
+        try:
+            await agent.run_daily_pipeline()
+        finally:
+            await agent.close()
+    
+    asyncio.run(run())
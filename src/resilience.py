@@ -0,0 +1,240 @@
+# src/resilience.py
+import asyncio
+import logging
+import os
+import time
+from typing import Dict, Optional
+
+from tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+# Circuit states
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpen(Exception):
+    """Raised instead of calling a provider that is currently failing"""
+    def __init__(self, provider: str, retry_in: float):
+        super().__init__(f"{provider} circuit open, retry in {retry_in:.0f}s")
+        self.provider = provider
+        self.retry_in = retry_in
+
+
+class TokenBucket:
+    """Request-rate limiter that backs off when the provider pushes back.
+
+    Tokens refill at `rate` per second up to `burst`. A throttling response
+    halves the rate (down to `min_rate`) and pauses the bucket for the
+    server's Retry-After, or one token interval, but never longer than
+    `max_pause`; each success then adds back 5% of the base rate (AIMD), so
+    the rate settles just under the quota. Waiters are served in arrival order.
+    """
+    def __init__(self, rate: float, burst: float = None, min_rate: float = None,
+                 max_pause: float = 30.0):
+        self.base_rate = rate
+        self.rate = rate
+        self.burst = burst or max(1.0, rate)
+        self.min_rate = min_rate or rate / 16
+        self.max_pause = max_pause
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def throttled(self, retry_after: Optional[float] = None):
+        self.rate = max(self.min_rate, self.rate / 2)
+        pause = min(retry_after if retry_after is not None else 1 / self.rate, self.max_pause)
+        now = time.monotonic()
+        self._refill(now)
+        self._tokens = 0
+        self._paused_until = max(self._paused_until, now + pause)
+
+    def succeeded(self):
+        if self.rate < self.base_rate:
+            self.rate = min(self.base_rate, self.rate + self.base_rate * 0.05)
+
+    def scale(self, factor: float):
+        """Take a share of the rate, e.g. 1/N when N processes call the same provider"""
+        self.base_rate *= factor
+        self.rate *= factor
+        self.min_rate *= factor
+        self.burst = max(1.0, self.burst * factor)
+        self._tokens = min(self._tokens, self.burst)
+
+
+class CircuitBreaker:
+    """Fails fast while a provider is down.
+
+    After `failure_threshold` consecutive failures the circuit opens and
+    calls raise CircuitOpen for `reset_timeout` seconds (or as long as
+    `trip()` asks). Then one trial call is let through (half-open): success
+    closes the circuit, failure opens it for another period.
+    """
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._open_for = reset_timeout
+        self._trial = False
+
+    def check(self):
+        """Raise CircuitOpen unless a call may go ahead now"""
+        if self.state == OPEN:
+            waited = time.monotonic() - self._opened_at
+            if waited < self._open_for:
+                raise CircuitOpen(self.name, self._open_for - waited)
+            self._set_state(HALF_OPEN)
+            self._trial = False
+        if self.state == HALF_OPEN:
+            if self._trial:
+                raise CircuitOpen(self.name, self.reset_timeout)
+            self._trial = True
+
+    def success(self):
+        self.failures = 0
+        self._trial = False
+        if self.state != CLOSED:
+            self._set_state(CLOSED)
+
+    def failure(self):
+        self.failures += 1
+        self._trial = False
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            self.trip()
+
+    def trip(self, seconds: Optional[float] = None):
+        """Open the circuit now, for `seconds` if given, else reset_timeout"""
+        self._trial = False
+        self._opened_at = time.monotonic()
+        self._open_for = max(seconds or 0.0, self.reset_timeout)
+        if self.state != OPEN:
+            self._set_state(OPEN)
+
+    def release(self):
+        """The call ended without an outcome (cancelled); let another trial through"""
+        self._trial = False
+
+    def _set_state(self, state: str):
+        logger.warning(f"{self.name} circuit {self.state} -> {state}")
+        tracer.count("circuit_transitions", provider=self.name, state=state)
+        self.state = state
+
+
+class Call:
+    """Outcome of one provider call, reported by the caller.
+
+    A call that returns normally without a report counts as a success; one
+    that raises is classified from the exception.
+    """
+    __slots__ = ("throttle", "retry_after", "error")
+
+    def __init__(self):
+        self.throttle = False
+        self.retry_after = None
+        self.error = None
+
+    def throttled(self, retry_after: Optional[float] = None):
+        """The provider said slow down (HTTP 429 or a quota error)"""
+        self.throttle = True
+        self.retry_after = retry_after
+
+    def failed(self, error):
+        """The provider failed (HTTP 5xx, transport error)"""
+        self.error = error
+
+
+def is_throttle(error: BaseException) -> bool:
+    """Whether an exception from a provider SDK means "rate limited" """
+    status = getattr(error, "status_code", None) or getattr(error, "status", None) or getattr(error, "code", None)
+    if status == 429:
+        return True
+    text = str(error).lower()
+    return "429" in text or "resource_exhausted" in text or "rate limit" in text or "quota" in text
+
+
+def retry_after(headers) -> Optional[float]:
+    """Seconds from a Retry-After header given as a number (dates are ignored)"""
+    try:
+        return float(headers.get("Retry-After"))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+class ProviderPolicy:
+    """Rate limit plus circuit breaker for one external provider.
+
+    A Retry-After longer than the breaker's reset_timeout is not waited out
+    in the bucket: the circuit opens for that long, so callers fail fast.
+    """
+    def __init__(self, name: str, rate: Optional[float] = None, failure_threshold: int = 5,
+                 reset_timeout: float = 30.0):
+        self.name = name
+        self.bucket = TokenBucket(rate, max_pause=reset_timeout) if rate else None
+        self.breaker = CircuitBreaker(name, failure_threshold, reset_timeout)
+
+    def record(self, call: Call):
+        if call.throttle:
+            tracer.count("provider_throttled", provider=self.name)
+            if self.bucket is not None:
+                self.bucket.throttled(call.retry_after)
+            if call.retry_after is not None and call.retry_after > self.breaker.reset_timeout:
+                self.breaker.trip(call.retry_after)
+            else:
+                # Sporadic 429s only slow the bucket; a run of them (quota gone) opens the circuit
+                self.breaker.failure()
+        elif call.error is not None:
+            tracer.count("provider_failures", provider=self.name)
+            self.breaker.failure()
+        else:
+            if self.bucket is not None:
+                self.bucket.succeeded()
+            self.breaker.success()
+
+
+def _env_float(name: str, default: Optional[float]) -> Optional[float]:
+    value = os.getenv(name)
+    if value in (None, ""):
+        return default
+    try:
+        return float(value) or None  # 0 turns the limit off
+    except ValueError:
+        logger.warning(f"Ignoring invalid {name}={value!r}, using {default}")
+        return default
+
+
+def policies_from_env() -> Dict[str, ProviderPolicy]:
+    """<PROVIDER>_RATE (requests/s, 0 = unlimited), CIRCUIT_FAILURES and CIRCUIT_RESET_SECONDS.
+
+    Rates are per process; the scheduler divides them among its workers
+    (ConcurrencyLimiter.share_rates), other processes each get the full rate.
+    """
+    failures = int(_env_float("CIRCUIT_FAILURES", 5) or 5)
+    reset = _env_float("CIRCUIT_RESET_SECONDS", 30.0) or 30.0
+    defaults = {"serpapi": 5.0, "gemini": 5.0, "mailjet": 10.0, "openai": 5.0}
+    return {
+        name: ProviderPolicy(name, _env_float(f"{name.upper()}_RATE", rate), failures, reset)
+        for name, rate in defaults.items()
+    }
@@ -1,59 +1,198 @@
 # src/scheduler.py
+import argparse
 import asyncio
 import json
 import logging
+import multiprocessing
 from datetime import datetime, timedelta
 import os
 from dotenv import load_dotenv
 
 from db import Database
 from main import NewsAgent
+from concurrency import limits, run_bounded
+from jobs import JobQueue, RESEARCH, SEND, SENT, SUMMARIZED
+from mailer import BATCH_SIZE
+from topic_index import build_topic_index, digest_from_labels, normalize_topic
+from tracing import tracer
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-async def run_schedular():
-    load_dotenv()
-    db = Database()
-    
+DUE_PAGE_SIZE = int(os.getenv("DUE_USERS_PAGE_SIZE", 500))
+PROGRESS_INTERVAL = 10  # seconds between coordinator progress reports
+
+def make_agent(db: Database) -> NewsAgent:
     # Config for NewsAgent
     config = {
         'google_api_key': os.getenv('GOOGLE_API_KEY'),
         'sender_email': os.getenv('SENDER_EMAIL'),
         # Recipient email is dynamic
     }
+    return NewsAgent(config, db=db)
+
+async def run_schedular(workers: int = 1):
+    """Run tonight's cycle in this process, or coordinate `workers` worker processes"""
+    load_dotenv()
+    db = Database()
     
-    agent = NewsAgent(config)
+    now = datetime.now()
+    run_date = now.strftime('%Y-%m-%d')
+    queue = JobQueue(db)
+    enqueue_run(db, queue, run_date, now)
     
-    users = db.get_verified_users()
-    logger.info(f"Found {len(users)} verified users.")
+    if workers > 1:
+        await coordinate(db, queue, run_date, workers)
+        return
     
-    for user_row in users:
-        email, topics_json, last_sent_at = user_row
+    agent = make_agent(db)
+    try:
+        await run_worker(agent, queue, run_date)
+    finally:
+        await agent.close()
+    logger.info(f"Run {run_date} progress: {queue.progress(run_date)}")
+
+def iter_due_pages(db: Database, now: datetime, page_size: int = None):
+    """Yield pages of (email, topics_json) for users due a digest, keyset-paginated by email"""
+    page_size = page_size or DUE_PAGE_SIZE
+    cursor = None
+    while True:
+        page = db.get_due_users(now, timedelta(hours=24), limit=page_size, cursor=cursor)
+        if not page:
+            return
+        yield page
+        cursor = page[-1][0]
+
+def enqueue_run(db: Database, queue: JobQueue, run_date: str, now: datetime) -> int:
+    """Turn tonight's due users into jobs: one research job per distinct topic, one send per user.
+    
+    Jobs already recorded for this run_date are kept, so re-running after a
+    crash picks up where it stopped.
+    """
+    users_due = 0
+    for page in iter_due_pages(db, now):
+        # Research each distinct topic once, however many subscribers share it
+        index = build_topic_index(page)
+        queue.enqueue(run_date, RESEARCH, {normalize_topic(t): t for t in index.distinct_topics()})
         
-        # Check if sent in last 24 hours
-        if last_sent_at:
-            last_sent = datetime.strptime(last_sent_at, '%Y-%m-%d %H:%M:%S.%f')
-            if datetime.now() - last_sent < timedelta(hours=24):
-                logger.info(f"Skipping {email}, sent recently at {last_sent_at}")
+        sends = {}
+        for email, labels in index.user_topics.items():
+            if not labels:
+                logger.info(f"Skipping {email}, no topics subscribed")
                 continue
-        
+            sends[email] = json.dumps(labels)
+        queue.enqueue(run_date, SEND, sends)
+        users_due += len(sends)
+    
+    if not users_due:
+        logger.info("No users due for a digest.")
+    else:
+        logger.info(f"Run {run_date}: {users_due} users due, progress {queue.progress(run_date)}")
+    return users_due
+
+async def drain(queue: JobQueue, run_date: str, kind: str, handle, batch_size: int = None):
+    """Lease and handle jobs until none are outstanding, sleeping through retry backoff"""
+    batch_size = batch_size or limits.global_limit
+    while True:
+        jobs = queue.lease(run_date, kind, batch_size)
+        if jobs:
+            await handle(jobs)
+            continue
+        wait = queue.next_wakeup(run_date, kind)
+        if wait is None:
+            return
+        await asyncio.sleep(min(max(wait, 1), 30))
+
+async def research_jobs(queue: JobQueue, agent: NewsAgent, jobs):
+    async def run(job):
         try:
-            topics = json.loads(topics_json)
-            logger.info(f"Processing for {email} with topics: {topics}")
-            
-            # Run Pipeline
-            summaries = await agent.run_daily_pipeline(topics=topics)
-            
-            # Send Email
-            await agent.send_digest(summaries, len(topics), to_email=email)
-            
-            # Update DB
-            db.update_last_sent(email)
-            logger.info(f"Successfully sent digest to {email}")
-            
+            summary = await agent.research_topic(job.payload, raise_errors=True)
+            queue.complete([job], SUMMARIZED, {job.id: summary})
         except Exception as e:
-            logger.error(f"Failed to process for user {email}: {e}")
+            queue.fail(job, e)
+    await run_bounded(jobs, run, limits.global_limit)
+
+async def send_jobs(queue: JobQueue, agent: NewsAgent, summaries, jobs):
+    db = agent.db
+    batch = {job.key: digest_from_labels(json.loads(job.payload), summaries) for job in jobs}
+    # Send Email, many digests per Mailjet request
+    statuses = await agent.send_digests(batch)
+    sent = [job for job in jobs if statuses.get(job.key) == "success"]
+    
+    # Send markers and last_sent_at move together, so a finished batch is never
+    # sent again. Delivery is still at-least-once: a crash after Mailjet accepted
+    # the batch but before this commit leaves the jobs leased, and they are sent
+    # again once the lease expires.
+    with db.transaction():
+        queue.complete(sent, SENT)
+        db.update_last_sent_many([job.key for job in sent])
+    for job in jobs:
+        if statuses.get(job.key) != "success":
+            queue.fail(job, f"Mailjet status: {statuses.get(job.key)}")
+    logger.info(f"Sent {len(sent)}/{len(jobs)} digests in batch")
+
+async def run_worker(agent: NewsAgent, queue: JobQueue, run_date: str):
+    """Work a run's jobs until none are left: all research first, then the sends.
+    
+    Any number of workers (in this process or other processes on the same
+    host) can do this at once; leases keep them apart. The database is SQLite
+    in WAL mode, which needs shared memory: never share the file between
+    hosts, e.g. over NFS.
+    """
+    with tracer.span("research_phase", run_date=run_date):
+        await drain(queue, run_date, RESEARCH, lambda jobs: research_jobs(queue, agent, jobs))
+    summaries = queue.results(run_date, RESEARCH)
+    # Lease enough sends to keep every Mailjet slot busy with a full batch
+    send_batch = BATCH_SIZE * limits.provider_limits.get("mailjet", 1)
+    with tracer.span("send_phase", run_date=run_date):
+        await drain(queue, run_date, SEND, lambda jobs: send_jobs(queue, agent, summaries, jobs),
+                    batch_size=send_batch)
+
+def worker_process(run_date: str, db_path: str = None, processes: int = 1):
+    """Entry point for a spawned worker process, one of `processes` sharing the provider rates"""
+    load_dotenv()
+    limits.share_rates(processes)
+    db = Database(db_path) if db_path else Database()
+    agent = make_agent(db)
+    
+    async def work():
+        try:
+            await run_worker(agent, JobQueue(db), run_date)
+        finally:
+            await agent.close()
+    
+    asyncio.run(work())
+
+async def coordinate(db: Database, queue: JobQueue, run_date: str, workers: int):
+    """Spawn worker processes on the enqueued run and report combined progress until they finish"""
+    ctx = multiprocessing.get_context("spawn")
+    procs = [ctx.Process(target=worker_process, args=(run_date, db.db_path, workers), name=f"worker-{i}")
+             for i in range(workers)]
+    for proc in procs:
+        proc.start()
+    logger.info(f"Started {workers} workers for run {run_date}")
+    
+    while any(proc.is_alive() for proc in procs):
+        await asyncio.sleep(PROGRESS_INTERVAL)
+        logger.info(f"Run {run_date} progress: {queue.progress(run_date)}")
+    
+    for proc in procs:
+        proc.join()
+        if proc.exitcode:
+            logger.error(f"{proc.name} exited with code {proc.exitcode}")
+    logger.info(f"Run {run_date} finished: {queue.progress(run_date)}")
 
 if __name__ == "__main__":
-    asyncio.run(run_schedular())
+    parser = argparse.ArgumentParser(description="Send tonight's digests")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("SCHEDULER_WORKERS", 1)),
+                        help="number of worker processes to coordinate")
+    parser.add_argument("--join", metavar="RUN_DATE",
+                        help="only work on an already enqueued run, from another process on this host "
+                             "(the SQLite database must not be shared across hosts); provider rates "
+                             "(<PROVIDER>_RATE) apply per process, so lower them there")
+    args = parser.parse_args()
+    
+    if args.join:
+        worker_process(args.join)
+    else:
+        asyncio.run(run_schedular(workers=args.workers))
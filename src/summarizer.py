@@ -1,17 +1,23 @@
 # src/summarizer.py
-from openai import OpenAI
+import asyncio
+from openai import AsyncOpenAI
 from typing import List, Dict
-import tiktoken
+from agent.context import token_counter
+from concurrency import limits
+from costs import CostTracker, cost_tracker, estimate_cost
+from topic_index import normalize_topic
 import json
 
 class LLMSummarizer:
-    def __init__(self, api_key: str, model: str = "gpt-4o-mini"):
-        self.client = OpenAI(api_key=api_key)
+    def __init__(self, api_key: str, model: str = "gpt-4o-mini", optimizer: "CostOptimizer" = None):
+        self.client = AsyncOpenAI(api_key=api_key)
         self.model = model
-        self.encoder = tiktoken.encoding_for_model("gpt-4")
+        self.optimizer = optimizer or CostOptimizer(model=model)
+        self.counter = token_counter
     
     def count_tokens(self, text: str) -> int:
-        return len(self.encoder.encode(text))
+        # Cached per document, shared with the graph's context packer
+        return self.counter.count(text)
     
     def create_batches(self, articles: List[Dict], max_tokens: int = 15000) -> List[List[Dict]]:
         """Group articles by topic and chunk by token count"""
@@ -37,8 +43,9 @@ class LLMSummarizer:
         
         return batches
     
-    async def summarize_batch(self, articles: List[Dict], topic: str) -> str:
-        """Summarize a batch of related articles"""
+    async def summarize_batch(self, articles: List[Dict], topic: str, previous: str = None,
+                              model: str = None) -> str:
+        """Summarize a batch of related articles, or only what is new since `previous`"""
         system_prompt = """You are an expert intelligence analyst. Your task is to:
         1. Identify key themes and narratives across the provided articles
         2. Provide a high-level synthesis of the trend
@@ -65,30 +72,119 @@ class LLMSummarizer:
         {articles_text}
 
         Please provide a comprehensive briefing."""
+        if previous:
+            # Delta briefing: the earlier one is there to say what not to repeat
+            system_prompt += """
         
+        Cover only what is new compared with the previous briefing; do not repeat
+        stories it already covered."""
+            user_prompt = f"Previous briefing:\n{previous}\n\n{user_prompt}"
+        
+        try:
+            return await self._complete(system_prompt, user_prompt, topic, model)
+        except Exception as e:
+            return f"## Summarization Error\n\nFailed to summarize: {str(e)}"
+    
+    async def reduce_summaries(self, partials: List[str], topic: str, fan_in: int = 4,
+                               model: str = None) -> str:
+        """Merge partial briefings hierarchically, `fan_in` at a time, until one remains"""
+        level = [p for p in partials if not p.startswith(ERROR_PREFIXES)]
+        if not level:
+            return partials[0] if partials else ""
+        while len(level) > 1:
+            groups = [level[i:i + fan_in] for i in range(0, len(level), fan_in)]
+            # a lone leftover passes through to the next level unchanged
+            leftover = groups.pop()[0] if len(groups[-1]) == 1 else None
+            level = list(await asyncio.gather(*[self._merge(group, topic, model) for group in groups]))
+            if leftover is not None:
+                level.append(leftover)
+        return level[0]
+    
+    async def _merge(self, briefings: List[str], topic: str, model: str = None) -> str:
+        system_prompt = """You are an expert intelligence analyst. You are given partial briefings,
+        each written from a different batch of articles on the same topic. Merge them into one
+        briefing: combine overlapping points, keep every distinct insight and source URL, and
+        note contradictions between batches.
+        
+        Format your response in Markdown with sections:
+        ## Key Takeaways
+        ## Detailed Analysis
+        ## Source Summaries (with URLs)"""
+        
+        joined = "\n\n---\n\n".join(f"Partial briefing {i + 1}:\n{b}" for i, b in enumerate(briefings))
+        user_prompt = f"""Topic: {topic}
+
+        {joined}
+
+        Please provide the merged briefing."""
         try:
+            return await self._complete(system_prompt, user_prompt, topic, model)
+        except Exception:
+            # Keep what we have rather than losing the whole branch
+            return "\n\n".join(briefings)
+    
+    async def summarize_topic(self, articles: List[Dict], topic: str, max_tokens: int = 15000,
+                              previous: str = None, model: str = None) -> str:
+        """Map-reduce over create_batches: summarize batches concurrently, then merge.
+        
+        With `previous`, each batch covers only what that briefing did not;
+        `model` overrides self.model (e.g. a cheaper one once the budget is tight).
+        """
+        batches = self.create_batches(articles, max_tokens=max_tokens)
+        if not batches:
+            return ""
+        partials = await asyncio.gather(*[self.summarize_batch(b, topic, previous, model) for b in batches])
+        if len(partials) == 1:
+            return partials[0]
+        return await self.reduce_summaries(list(partials), topic, model=model)
+    
+    async def _complete(self, system_prompt: str, user_prompt: str, topic: str, model: str = None) -> str:
+        """One chat completion under the OpenAI concurrency limit and the daily budget"""
+        model = model or self.model
+        max_tokens = 2000
+        estimated = estimate_cost(model, self.count_tokens(system_prompt + user_prompt), max_tokens)
+        if not self.optimizer.can_process(estimated):
+            raise BudgetExceeded("The daily LLM budget has been reached.")
+        
+        async with limits.provider("openai"):
             response = await self.client.chat.completions.create(
-                model=self.model,
+                model=model,
                 messages=[
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": user_prompt}
                 ],
                 temperature=0.3,
-                max_tokens=2000
+                max_tokens=max_tokens
             )
-            return response.choices[0].message.content
-        except Exception as e:
-            return f"## Summarization Error\n\nFailed to summarize: {str(e)}"
-# Add to summarizer.py
+        self.optimizer.tracker.record_response("openai", model, response, topic=normalize_topic(topic))
+        return response.choices[0].message.content
+
+
+class BudgetExceeded(Exception):
+    pass
+
+
+ERROR_PREFIXES = ("## Summarization Error",)
+
 class CostOptimizer:
     """Monitor and optimize API usage"""
-    def __init__(self, budget_daily=1.0):  # $1 per day
-        self.budget_daily = budget_daily
-        self.costs_today = 0.0
+    def __init__(self, budget_daily: float = None, model: str = "gpt-4o-mini", tracker: CostTracker = None):
+        self.model = model
+        self.tracker = tracker or cost_tracker
+        # Spend is counted across every provider, so the limit defaults to the tracker's DAILY_BUDGET_USD
+        self._budget_daily = budget_daily
+
+    @property
+    def budget_daily(self) -> float:
+        return self._budget_daily if self._budget_daily is not None else self.tracker.budget_daily
+    
+    @property
+    def costs_today(self) -> float:
+        # Persisted totals across every provider, not just this process
+        return self.tracker.spent_today()
         
     def estimate_cost(self, tokens_in: int, tokens_out: int) -> float:
-        # GPT-4o-mini pricing: $0.15/1M tokens in, $0.60/1M tokens out
-        return (tokens_in * 0.15 / 1_000_000) + (tokens_out * 0.60 / 1_000_000)
+        return estimate_cost(self.model, tokens_in, tokens_out)
     
     def can_process(self, estimated_cost: float) -> bool:
         return (self.costs_today + estimated_cost) <= self.budget_daily
@@ -0,0 +1,53 @@
+# src/topic_index.py
+import json
+import logging
+from typing import Dict, Iterable, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_topic(topic: str) -> str:
+    """Canonical form used to decide whether two topics are the same research job"""
+    return " ".join(topic.split()).casefold()
+
+
+def digest_from_labels(labels: Iterable[str], summaries: Dict[str, str]) -> Dict[str, str]:
+    """{label: summary} for one user, looking summaries up by normalized topic"""
+    return {label: summaries.get(normalize_topic(label), "No summary generated.") for label in labels}
+
+
+class TopicIndex:
+    """Distinct (normalized) topics across users, and each user's labels"""
+    def __init__(self):
+        self.labels: Dict[str, str] = {}          # normalized -> first label seen
+        self.user_topics: Dict[str, List[str]] = {}  # email -> labels as the user typed them
+
+    def add_user(self, email: str, topics: Iterable[str]):
+        labels, keys = [], set()
+        for topic in topics:
+            label = topic.strip()
+            key = normalize_topic(label)
+            if not key or key in keys:
+                continue
+            keys.add(key)
+            self.labels.setdefault(key, label)
+            labels.append(label)
+        self.user_topics[email] = labels
+
+    def distinct_topics(self) -> List[str]:
+        """One representative label per normalized topic"""
+        return list(self.labels.values())
+
+    def __len__(self):
+        return len(self.labels)
+
+
+def build_topic_index(users: Iterable[Tuple[str, str]]) -> TopicIndex:
+    """Build the index from (email, topics_json) rows"""
+    index = TopicIndex()
+    for email, topics_json in users:
+        try:
+            index.add_user(email, json.loads(topics_json))
+        except (TypeError, ValueError) as e:
+            logger.error(f"Skipping {email}, unreadable topics: {e}")
+    return index
@@ -0,0 +1,72 @@
+# src/topic_validation.py
+import logging
+import os
+import re
+from typing import Iterable, Optional
+
+import yaml
+
+from topic_index import build_topic_index, normalize_topic
+
+logger = logging.getLogger(__name__)
+
+# Common news beats; anything here (or already subscribed to) skips the LLM
+BUILTIN_TOPICS = [
+    "artificial intelligence", "ai", "machine learning", "technology", "startups", "cybersecurity",
+    "climate change", "energy", "renewable energy", "global economy", "economy", "markets",
+    "stock market", "finance", "cryptocurrency", "politics", "world news", "business",
+    "health", "science", "space", "sports", "football", "cricket", "formula 1", "education",
+    "entertainment", "movies", "music", "gaming", "travel", "real estate", "automotive",
+]
+
+_ALNUM = re.compile(r"[^\W_]")
+
+
+def classify_topic(topic: str) -> Optional[bool]:
+    """Cheap verdict for certain junk: False, else None so the (cached) LLM decides.
+
+    Only text that cannot be a topic is rejected here; short or unusual real
+    topics must still reach the LLM:
+
+    >>> [classify_topic(t) for t in ("", "   ", "!!!", "-- ??")]
+    [False, False, False, False]
+    >>> [classify_topic(t) for t in ("LGBTQ rights", "G20", "5G", "F1", "Knightsbridge")]
+    [None, None, None, None, None]
+
+    Never returns True on its own; acceptance without the LLM comes from the allowlist.
+    """
+    topic = normalize_topic(topic)
+    if not _ALNUM.search(topic):
+        return False
+    return None
+
+
+class TopicAllowlist:
+    """Normalized topics known to be valid: built-ins, topics.yaml, existing subscriptions
+    and topics the LLM has already accepted in this process."""
+    def __init__(self, topics: Iterable[str] = (), max_learned: int = 10000):
+        self.known = {normalize_topic(t) for t in topics}
+        self.max_learned = max_learned
+        self._learned = 0
+
+    @classmethod
+    def load(cls, db=None, path: str = None) -> "TopicAllowlist":
+        allowlist = cls(BUILTIN_TOPICS)
+        path = path or os.getenv("TOPICS_FILE", "src/topics.yaml")
+        try:
+            with open(path) as f:
+                allowlist.known.update(normalize_topic(t) for t in (yaml.safe_load(f) or {}).get("topics", []))
+        except OSError as e:
+            logger.info(f"No topics file for the allowlist: {e}")
+        if db is not None:
+            index = build_topic_index((email, topics) for email, topics, _ in db.get_verified_users())
+            allowlist.known.update(index.labels)
+        return allowlist
+
+    def __contains__(self, topic: str) -> bool:
+        return normalize_topic(topic) in self.known
+
+    def learn(self, topic: str):
+        if self._learned < self.max_learned:
+            self.known.add(normalize_topic(topic))
+            self._learned += 1
@@ -0,0 +1,207 @@
+# src/tracing.py
+import functools
+import inspect
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Histogram bounds for span durations, in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_current: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start", "duration", "attrs", "error")
+
+    def __init__(self, name: str, parent: Optional["Span"], attrs: dict):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex[:16]
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent else None
+        self.start = time.time()
+        self.duration = 0.0
+        self.attrs = attrs
+        self.error = None
+
+    def set(self, **attrs):
+        """Attach results known only once the work is done (status, bytes, tokens...)"""
+        self.attrs.update(attrs)
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name, "trace": self.trace_id, "span": self.span_id, "parent": self.parent_id,
+            "start": round(self.start, 6), "ms": round(self.duration * 1000, 3),
+            "attrs": self.attrs, "error": self.error,
+        }
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+
+class Tracer:
+    """Span timing and counters for the pipeline's hot paths.
+
+    `span()` times a block and nests under whatever span is current in the
+    task (contextvars carry it across awaits and into `asyncio.to_thread`).
+    Every finished span feeds a per-name duration histogram; `count()` adds
+    to labelled counters (tokens, bytes fetched, cache hits and misses).
+    Finished spans are appended to a JSONL file when `path` is set, and
+    `prometheus()` renders the aggregates in the Prometheus text format.
+    """
+    def __init__(self, path: Optional[str] = None, prefix: str = "newsagent"):
+        self.path = path
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._file = None
+        self._durations: Dict[str, list] = {}  # span -> [count, sum, errors, bucket counts]
+        self._counters: Dict[str, Dict[tuple, float]] = {}
+
+    @classmethod
+    def from_env(cls) -> "Tracer":
+        return cls(path=os.getenv("TRACE_FILE") or None)
+
+    @contextmanager
+    def span(self, name: str, **attrs):
+        span = Span(name, _current.get(), attrs)
+        token = _current.set(span)
+        started = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            span.duration = time.perf_counter() - started
+            _current.reset(token)
+            self._finish(span)
+
+    def traced(self, name: str = None):
+        """Decorator running each call of a sync or async function in a span"""
+        def decorate(fn):
+            span_name = name or fn.__qualname__
+            if inspect.iscoroutinefunction(fn):
+                @functools.wraps(fn)
+                async def async_wrapper(*args, **kwargs):
+                    with self.span(span_name):
+                        return await fn(*args, **kwargs)
+                return async_wrapper
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.span(span_name):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def count(self, name: str, value: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def _finish(self, span: Span):
+        with self._lock:
+            stats = self._durations.get(span.name)
+            if stats is None:
+                stats = self._durations[span.name] = [0, 0.0, 0, [0] * len(BUCKETS)]
+            stats[0] += 1
+            stats[1] += span.duration
+            if span.error:
+                stats[2] += 1
+            for i, bound in enumerate(BUCKETS):
+                if span.duration <= bound:
+                    stats[3][i] += 1
+            if self.path:
+                self._write(span)
+
+    def _write(self, span: Span):
+        try:
+            if self._file is None:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                self._file = open(self.path, "a", buffering=1)
+            self._file.write(json.dumps(span.to_dict(), default=str) + "\n")
+        except OSError as e:
+            logger.error(f"Disabling trace file {self.path}: {e}")
+            self.path = None
+
+    def prometheus(self) -> str:
+        """Aggregates in the Prometheus text exposition format"""
+        metric = f"{self.prefix}_span_duration_seconds"
+        lines = [f"# TYPE {metric} histogram"]
+        with self._lock:
+            durations = {name: (c, s, e, list(b)) for name, (c, s, e, b) in self._durations.items()}
+            counters = {name: dict(series) for name, series in self._counters.items()}
+        for name, (count, total, _, buckets) in sorted(durations.items()):
+            label = f'span="{_escape(name)}"'
+            for bound, hits in zip(BUCKETS, buckets):
+                lines.append(f'{metric}_bucket{{{label},le="{bound}"}} {hits}')
+            lines.append(f'{metric}_bucket{{{label},le="+Inf"}} {count}')
+            lines.append(f"{metric}_sum{{{label}}} {total:.6f}")
+            lines.append(f"{metric}_count{{{label}}} {count}")
+        lines.append(f"# TYPE {self.prefix}_span_errors_total counter")
+        for name, (_, _, errors, _) in sorted(durations.items()):
+            lines.append(f'{self.prefix}_span_errors_total{{span="{_escape(name)}"}} {errors}')
+        for name, series in sorted(counters.items()):
+            lines.append(f"# TYPE {self.prefix}_{name}_total counter")
+            for labels, value in sorted(series.items()):
+                lines.append(f"{self.prefix}_{name}_total{_labels(labels)} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str):
+        """Dump the aggregates for a textfile collector (batch runs have no endpoint to scrape)"""
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            f.write(self.prometheus())
+        os.replace(tmp, path)
+
+    def cache_hit_rates(self) -> Dict[str, float]:
+        """{cache: hits / lookups} from the cache_requests counter (any result but "miss" is a hit)"""
+        totals: Dict[str, list] = {}
+        with self._lock:
+            series = dict(self._counters.get("cache_requests", {}))
+        for labels, value in series.items():
+            labels = dict(labels)
+            entry = totals.setdefault(labels.get("cache", ""), [0, 0])
+            entry[1] += value
+            if labels.get("result") != "miss":
+                entry[0] += value
+        return {cache: hits / lookups for cache, (hits, lookups) in totals.items() if lookups}
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def trace_methods(prefix: str, exclude=()):
+    """Class decorator putting every public method in a "<prefix>.<method>" span"""
+    def decorate(cls):
+        for name, member in list(vars(cls).items()):
+            if name.startswith("_") or name in exclude or not inspect.isfunction(member):
+                continue
+            setattr(cls, name, tracer.traced(f"{prefix}.{name}")(member))
+        return cls
+    return decorate
+
+
+# Process-wide tracer; set TRACE_FILE to also keep every span as JSONL
+tracer = Tracer.from_env()